@@ -0,0 +1,96 @@
+"""
+Benchmark: cost of resolving numeric strings that contain a dot.
+
+Values such as '3.5' coming out of states() used to be treated as entity IDs
+because they contain a '.', costing a state machine lookup and a warning on
+every call. This compares that legacy check, with a copy of the legacy
+uncached lookup, against the current _is_entity_id() fast path.
+
+Run from the repository root:
+    python benchmarks/bench_entity_detection.py
+"""
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "custom_components"))
+
+import unit_conversions  # noqa: E402
+
+NUMBER = 200000
+VALUES = ("3.5", "1234.0", "-0.25", "sensor.power_meter")
+
+
+class _FakeStates:
+    """Minimal stand-in for hass.states holding a single sensor."""
+
+    def __init__(self):
+        self._states = {}
+
+    def get(self, entity_id):
+        return self._states.get(entity_id)
+
+
+class _FakeConfig:
+    components = {"sensor", "input_number", "template"}
+
+
+class _FakeHass:
+    states = _FakeStates()
+    config = _FakeConfig()
+
+
+_LOGGER = logging.getLogger(unit_conversions.__name__)
+
+
+def _legacy_get_entity_state(entity_id):
+    """Entity lookup as it was: uncached, logging a warning on every failure."""
+    hass = unit_conversions._hass_instance
+    if hass is None:
+        _LOGGER.warning("Home Assistant instance not available")
+        return None, None
+
+    state = hass.states.get(entity_id)
+    if state is None:
+        _LOGGER.warning("Entity '%s' not found", entity_id)
+        return None, None
+
+    try:
+        value = float(state.state)
+    except (ValueError, TypeError):
+        _LOGGER.warning("Entity '%s' state '%s' is not numeric", entity_id, state.state)
+        return None, None
+
+    unit = state.attributes.get('unit_of_measurement')
+    return value, unit
+
+
+def _legacy_resolve(value, from_unit):
+    """Entity detection as it was: any string containing a dot."""
+    if isinstance(value, str) and '.' in value:
+        entity_value, entity_unit = _legacy_get_entity_state(value)
+        if entity_value is not None:
+            return entity_value, from_unit if from_unit is not None else entity_unit
+    return value, from_unit
+
+
+def main():
+    # Keep warning records being created, as in production, but drop the I/O
+    _LOGGER.addHandler(logging.NullHandler())
+    _LOGGER.propagate = False
+    unit_conversions._hass_instance = _FakeHass()
+
+    for value in VALUES:
+        before = timeit.timeit(lambda: _legacy_resolve(value, "W"), number=NUMBER)
+        after = timeit.timeit(
+            lambda: unit_conversions._resolve_value_and_unit(value, "W"), number=NUMBER
+        )
+        print(
+            f"{value!r:22} before {before / NUMBER * 1e9:8.0f} ns/call"
+            f"   after {after / NUMBER * 1e9:8.0f} ns/call   ({before / after:5.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,43 +9,525 @@ Provides Jinja2 template filters for comprehensive unit conversions including:
 
 All filters include robust error handling and support multiple unit name variations.
 """
+from array import array
 import logging
-from homeassistant.helpers import template
+import numbers
+import re
+import string
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from datetime import timedelta
+from fractions import Fraction
+from functools import lru_cache
+from homeassistant.const import (
+    CONF_METHOD,
+    CONF_NAME,
+    CONF_SOURCE,
+    CONF_UNIQUE_ID,
+    CONF_UNIT_OF_MEASUREMENT,
+    EVENT_STATE_CHANGED,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+    Platform,
+)
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv, discovery, template
+from homeassistant.helpers.event import async_track_time_interval
+from jinja2 import pass_context
+from jinja2.ext import Extension
+from jinja2.lexer import (
+    TOKEN_ADD,
+    TOKEN_COMMA,
+    TOKEN_DOT,
+    TOKEN_FLOAT,
+    TOKEN_INTEGER,
+    TOKEN_LPAREN,
+    TOKEN_NAME,
+    TOKEN_PIPE,
+    TOKEN_RBRACE,
+    TOKEN_RBRACKET,
+    TOKEN_RPAREN,
+    TOKEN_STRING,
+    TOKEN_SUB,
+    Token,
+)
+import voluptuous as vol
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; arrays are converted in pure Python without it
+    np = None
+
+from .const import (
+    CONF_ABSOLUTE_DEADBAND,
+    CONF_COALESCE_WINDOW,
+    CONF_DERIVATIVES,
+    CONF_DIMENSION_SIGNIFICANT_DIGITS,
+    CONF_ERROR_POLICY,
+    CONF_INTEGRALS,
+    CONF_MIN_INTERVAL,
+    CONF_MIRROR_DEVICE_CLASSES,
+    CONF_MIRRORS,
+    CONF_RELATIVE_DEADBAND,
+    CONF_SIGNIFICANT_DIGITS,
+    CONF_TIME_WINDOW,
+    CONF_UNAVAILABLE_DEFAULT,
+    CONF_WARNING_INTERVAL,
+    DEFAULT_ERROR_POLICY,
+    DEFAULT_WARNING_INTERVAL,
+    DOMAIN,
+    INTEGRATION_METHODS,
+    METHOD_TRAPEZOIDAL,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+def _valid_error_policy(value):
+    """Validate an error policy spec from the configuration."""
+    try:
+        _get_error_policy(value)
+    except ValueError as err:
+        raise vol.Invalid(str(err)) from err
+    return value
+
+def _valid_unit(value):
+    """Validate that a unit from the configuration is supported."""
+    if _canonical_unit(value) is None:
+        raise vol.Invalid(f"Unsupported unit '{value}'")
+    return value
+
+def _valid_dimension(value):
+    """Validate that a dimension name from the configuration is known."""
+    if value not in _BASE_UNITS:
+        raise vol.Invalid(f"Unknown dimension '{value}', expected one of {', '.join(_BASE_UNITS)}")
+    return value
+
+def _valid_rate_unit(value):
+    """Validate that a unit from the configuration is a power or flow unit."""
+    unit = _canonical_unit(value)
+    if unit is None or _UNITS[unit].dimension not in _TOTAL_DIMENSIONS:
+        raise vol.Invalid(f"Unit '{value}' is not a power or flow unit")
+    return value
+
+def _valid_total_unit(value):
+    """Validate that a unit from the configuration is an energy or volume unit."""
+    unit = _canonical_unit(value)
+    if unit is None or _UNITS[unit].dimension not in _RATE_DIMENSIONS:
+        raise vol.Invalid(f"Unit '{value}' is not an energy or volume unit")
+    return value
+
+_non_negative_float = vol.All(vol.Coerce(float), vol.Range(min=0))
+
+# An interval of 0 would flush warnings in a busy loop
+_warning_interval = vol.All(vol.Coerce(int), vol.Range(min=1))
+
+# A double carries 17 significant digits at most
+_significant_digits = vol.All(vol.Coerce(int), vol.Range(min=1, max=17))
+
+# When converted entities write a new state; set globally or per mirror
+WRITE_OPTIONS = {
+    vol.Optional(CONF_ABSOLUTE_DEADBAND): _non_negative_float,
+    vol.Optional(CONF_RELATIVE_DEADBAND): _non_negative_float,
+    vol.Optional(CONF_MIN_INTERVAL): _non_negative_float,
+}
+
+MIRROR_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_SOURCE): cv.entity_id,
+        vol.Required(CONF_UNIT_OF_MEASUREMENT): vol.All(cv.string, _valid_unit),
+        vol.Optional(CONF_NAME): cv.string,
+        vol.Optional(CONF_UNIQUE_ID): cv.string,
+        **WRITE_OPTIONS,
+    }
+)
+
+INTEGRAL_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_SOURCE): cv.entity_id,
+        vol.Required(CONF_UNIT_OF_MEASUREMENT): vol.All(cv.string, _valid_total_unit),
+        vol.Optional(CONF_METHOD, default=METHOD_TRAPEZOIDAL): vol.In(INTEGRATION_METHODS),
+        vol.Optional(CONF_NAME): cv.string,
+        vol.Optional(CONF_UNIQUE_ID): cv.string,
+    }
+)
+
+DERIVATIVE_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_SOURCE): cv.entity_id,
+        vol.Required(CONF_UNIT_OF_MEASUREMENT): vol.All(cv.string, _valid_rate_unit),
+        vol.Optional(CONF_TIME_WINDOW, default=0.0): _non_negative_float,
+        vol.Optional(CONF_NAME): cv.string,
+        vol.Optional(CONF_UNIQUE_ID): cv.string,
+    }
+)
+
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.All(
+            # A bare "unit_conversions:" entry has no options
+            lambda value: value or {},
+            vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_WARNING_INTERVAL, default=DEFAULT_WARNING_INTERVAL
+                    ): _warning_interval,
+                    vol.Optional(CONF_UNAVAILABLE_DEFAULT): vol.Any(None, vol.Coerce(float)),
+                    vol.Optional(
+                        CONF_ERROR_POLICY, default=DEFAULT_ERROR_POLICY
+                    ): vol.All(cv.string, _valid_error_policy),
+                    vol.Optional(CONF_MIRRORS, default=[]): vol.All(
+                        cv.ensure_list, [MIRROR_SCHEMA]
+                    ),
+                    vol.Optional(CONF_MIRROR_DEVICE_CLASSES, default={}): {
+                        cv.string: vol.All(cv.string, _valid_unit)
+                    },
+                    **WRITE_OPTIONS,
+                    vol.Optional(CONF_COALESCE_WINDOW): _non_negative_float,
+                    vol.Optional(CONF_INTEGRALS, default=[]): vol.All(
+                        cv.ensure_list, [INTEGRAL_SCHEMA]
+                    ),
+                    vol.Optional(CONF_DERIVATIVES, default=[]): vol.All(
+                        cv.ensure_list, [DERIVATIVE_SCHEMA]
+                    ),
+                    vol.Optional(CONF_SIGNIFICANT_DIGITS): _significant_digits,
+                    vol.Optional(CONF_DIMENSION_SIGNIFICANT_DIGITS, default={}): {
+                        _valid_dimension: _significant_digits
+                    },
+                }
+            ),
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
 _TemplateEnvironment = template.TemplateEnvironment
 
+# ========== WARNING AGGREGATION ==========
+
+class _WarningAggregator:
+    """
+    Collapse repeated conversion warnings into periodic summary lines.
+
+    Warnings are counted per (filter, reason, subject) and logged once per
+    interval with their occurrence count, instead of one record per call.
+    """
+
+    # Distinct keys kept for diagnostics; further subjects are counted together
+    max_keys = 500
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.totals = {}
+        self._pending = {}
+        self._next_flush = time.monotonic() + interval
+
+    def warn(self, filter_name, reason, subject=None):
+        """Count one occurrence of a warning."""
+        if subject is not None and not isinstance(subject, str):
+            subject = repr(subject)
+        key = (filter_name, reason, subject)
+        if key not in self.totals and len(self.totals) >= self.max_keys:
+            key = (filter_name, reason, "<other>")
+        self._pending[key] = self._pending.get(key, 0) + 1
+        self.totals[key] = self.totals.get(key, 0) + 1
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    @callback
+    def flush(self, *_):
+        """Log one summary line per warning seen since the last flush."""
+        self._next_flush = time.monotonic() + self.interval
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        for (filter_name, reason, subject), count in pending.items():
+            if subject is None:
+                _LOGGER.warning("%s: %s (%d times in the last %d s)",
+                                filter_name, reason, count, self.interval)
+            else:
+                _LOGGER.warning("%s: %s: '%s' (%d times in the last %d s)",
+                                filter_name, reason, subject, count, self.interval)
+
+    def info(self):
+        """Return all-time warning counts keyed by 'filter: reason: subject'."""
+        return {
+            f"{filter_name}: {reason}: {subject}": count
+            for (filter_name, reason, subject), count in self.totals.items()
+        }
+
+_WARNINGS = _WarningAggregator(DEFAULT_WARNING_INTERVAL)
+
+# ========== ERROR POLICIES ==========
+
+class UnitConversionError(HomeAssistantError):
+    """Raised by conversions using the 'strict' error policy."""
+
+def _warn_policy(filter_name, reason, subject, passthrough):
+    """Error handler of the 'warn' policy: log (aggregated) and return None."""
+    _WARNINGS.warn(filter_name, reason, subject)
+    return None
+
+# Policy specs come from template literals and configuration, so few are distinct
+_ERROR_POLICY_CACHE_SIZE = 64
+
+@lru_cache(maxsize=_ERROR_POLICY_CACHE_SIZE)
+def _compile_error_policy(spec):
+    """
+    Build the error handler for an error policy spec.
+    
+    Supported policies:
+        warn         log an aggregated warning; unknown units fall back to the
+                     filter's default unit (the historical behavior)
+        none         return None
+        default=<x>  return x (a number when x is numeric)
+        passthrough  return the input unchanged
+        strict       raise UnitConversionError
+    
+    Args:
+        spec: Policy spec string
+    
+    Returns:
+        Function (filter_name, reason, subject, passthrough) -> result
+    
+    Raises:
+        ValueError: If the spec is not a valid policy
+    """
+    mode, sep, argument = str(spec).partition("=")
+    mode = mode.strip().lower()
+    if mode == "warn" and not sep:
+        return _warn_policy
+    if mode == "none" and not sep:
+        def handler(filter_name, reason, subject, passthrough):
+            return None
+    elif mode == "default" and sep:
+        default = _parse_number(argument)
+        if default is None:
+            default = argument.strip()
+        def handler(filter_name, reason, subject, passthrough):
+            return default
+    elif mode == "passthrough" and not sep:
+        def handler(filter_name, reason, subject, passthrough):
+            return passthrough
+    elif mode == "strict" and not sep:
+        def handler(filter_name, reason, subject, passthrough):
+            raise UnitConversionError(f"{filter_name}: {reason}: {subject!r}")
+    else:
+        raise ValueError(
+            f"Invalid error policy '{spec}', expected one of: "
+            "warn, none, default=<value>, passthrough, strict"
+        )
+    return handler
+
+def _get_error_policy(spec):
+    """
+    Return the compiled error handler for a policy spec.
+    
+    Args:
+        spec: Policy spec string, or None for the configured error_policy
+    
+    Raises:
+        ValueError: If the spec is not a valid policy
+    """
+    if spec is None:
+        return _error_policy
+    return _compile_error_policy(spec)
+
+# Handler used when a call does not choose a policy, set from error_policy
+_error_policy = _warn_policy
+
 # Global reference to Home Assistant instance for use in filters
 _hass_instance = None
 
+# ========== NUMERIC PARSING ==========
+
+# States that mean "no reading" rather than a malformed value
+_SENTINEL_STATES = frozenset((STATE_UNKNOWN, STATE_UNAVAILABLE, "None", "none", ""))
+
+# Result returned for sentinel states, set from the unavailable_default option
+_unavailable_default = None
+
+# Strings float() accepts, so they can be vetted without raising
+_NUMBER_RE = re.compile(
+    r"\s*[+-]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|inf(?:inity)?|nan)\s*",
+    re.IGNORECASE,
+)
+
+def _parse_number(value):
+    """
+    Convert a value to float without raising.
+    
+    Args:
+        value: Number, numeric string or any other object
+    
+    Returns:
+        The value as float, or None if it is not numeric
+    """
+    value_type = type(value)
+    if value_type is float:
+        return value
+    if value_type is int:
+        return float(value)
+    if value_type is str:
+        return float(value) if _NUMBER_RE.fullmatch(value) else None
+    if isinstance(value, numbers.Real):
+        return float(value)
+    return None
+
+def _is_sentinel(value):
+    """Return True for None and states such as 'unavailable' or 'unknown'."""
+    return value is None or (type(value) is str and value.strip() in _SENTINEL_STATES)
+
+# ========== ENTITY STATE CACHE ==========
+
+EntityReading = namedtuple("EntityReading", ("value", "unit", "canonical_unit", "dimension", "state"))
+
+# Upper bound on cached entities; least recently used readings are evicted first
+_ENTITY_CACHE_SIZE = 2048
+
+class _EntityStateCache:
+    """
+    Bounded LRU cache of parsed entity readings.
+
+    A reading is dropped when its entity fires state_changed, so each state is
+    parsed once no matter how many templates convert it. Nothing is stored
+    until the state_changed listener is active, as readings cached before then
+    would never be invalidated.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        # Set once the state_changed listener invalidating readings is registered
+        self.active = False
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, entity_id):
+        """Return the cached reading for entity_id, or None on a miss."""
+        reading = self._entries.get(entity_id)
+        if reading is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(entity_id)
+        return reading
+
+    def put(self, entity_id, reading):
+        """Store a reading, evicting the least recently used one when full."""
+        if not self.active:
+            return
+        self._entries[entity_id] = reading
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, entity_id):
+        """Forget the reading of entity_id, if cached."""
+        self._entries.pop(entity_id, None)
+
+    def clear(self):
+        """Forget all readings."""
+        self._entries.clear()
+
+    def info(self):
+        """Return size and hit statistics of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "active": self.active,
+        }
+
+_ENTITY_CACHE = _EntityStateCache(_ENTITY_CACHE_SIZE)
+
+def _parse_entity_state(state):
+    """
+    Parse a State object into an EntityReading.
+
+    Args:
+        state: Home Assistant State object
+
+    Returns:
+        EntityReading; its value is None if the state is not numeric
+    """
+    unit = state.attributes.get('unit_of_measurement')
+    canonical_unit = _canonical_unit(unit) if isinstance(unit, str) else None
+    dimension = _UNITS[canonical_unit].dimension if canonical_unit is not None else None
+    return EntityReading(_parse_number(state.state), unit, canonical_unit, dimension, state.state)
+
+@callback
+def _async_handle_state_changed(event):
+    """Drop cached data of an entity and re-index it whenever its state changes."""
+    entity_id = event.data["entity_id"]
+    _ENTITY_CACHE.invalidate(entity_id)
+    _UNIT_INDEX.update(entity_id, event.data["new_state"])
+
+# Resolved value of an entity ID that does not exist
+_ENTITY_NOT_FOUND = object()
+
 def _get_entity_state(entity_id):
     """
     Retrieve the state and unit of measurement for an entity.
     
+    Parsed readings are served from the entity state cache until the entity
+    changes state. The entity is recorded in the render info of the template
+    being rendered, like states() does, so template entities track it.
+    
     Args:
         entity_id: The entity ID (e.g., 'sensor.power_meter')
     
     Returns:
-        Tuple of (value, unit) or (None, None) if entity not found
+        Tuple of (value, unit). The value is the raw state string if it is not
+        numeric, or _ENTITY_NOT_FOUND if the entity does not exist
+    """
+    # Register the entity with the template being rendered, so it re-renders
+    # when this entity changes
+    render_info = template.render_info_cv.get()
+    if render_info is not None:
+        render_info.entities.add(entity_id)
+    
+    reading = _ENTITY_CACHE.get(entity_id)
+    if reading is None:
+        state = _hass_instance.states.get(entity_id) if _hass_instance is not None else None
+        if state is None:
+            return _ENTITY_NOT_FOUND, None
+        
+        reading = _parse_entity_state(state)
+        _ENTITY_CACHE.put(entity_id, reading)
+    
+    unit = reading.canonical_unit or reading.unit
+    if reading.value is None:
+        return reading.state, unit
+    return reading.value, unit
+
+def _is_entity_id(value):
     """
-    if _hass_instance is None:
-        _LOGGER.warning("Home Assistant instance not available")
-        return None, None
+    Cheaply decide whether a string names an entity.
     
-    state = _hass_instance.states.get(entity_id)
-    if state is None:
-        _LOGGER.warning("Entity '%s' not found", entity_id)
-        return None, None
+    Numeric strings such as '3.5' (common output of states()) are rejected
+    without any lookup, and the domain must belong to a loaded integration
+    before the state machine is consulted.
     
-    try:
-        value = float(state.state)
-    except (ValueError, TypeError):
-        _LOGGER.warning("Entity '%s' state '%s' is not numeric", entity_id, state.state)
-        return None, None
+    Args:
+        value: String to check
     
-    unit = state.attributes.get('unit_of_measurement')
-    return value, unit
+    Returns:
+        True if value should be resolved as an entity ID
+    """
+    dot = value.find('.')
+    if dot <= 0 or dot == len(value) - 1:
+        return False
+    domain = value[:dot]
+    if domain.isdigit() or domain[0] in '+-':
+        return False
+    if _hass_instance is not None and domain not in _hass_instance.config.components:
+        return False
+    return True
 
 def _resolve_value_and_unit(value, from_unit):
     """
@@ -58,28 +540,925 @@ def _resolve_value_and_unit(value, from_unit):
     Returns:
         Tuple of (resolved_value, resolved_unit)
     """
-    # Check if value is a string that looks like an entity ID
-    if isinstance(value, str) and '.' in value:
-        # Try to get entity state
+    # Check if value is a string that names an entity
+    if isinstance(value, str) and _is_entity_id(value):
         entity_value, entity_unit = _get_entity_state(value)
-        if entity_value is not None:
-            # Use entity's unit if from_unit not specified
-            resolved_unit = from_unit if from_unit is not None else entity_unit
-            return entity_value, resolved_unit
+        # Use entity's unit if from_unit not specified
+        resolved_unit = from_unit if from_unit is not None else entity_unit
+        return entity_value, resolved_unit
     
     # Value is not an entity ID, use as-is
     return value, from_unit
 
+# ========== UNIT REGISTRY ==========
+
+POWER = "power"
+ENERGY = "energy"
+FLOW = "flow"
+VOLUME = "volume"
+TEMPERATURE = "temperature"
+
+UnitDefinition = namedtuple(
+    "UnitDefinition", ("unit", "dimension", "scale", "offset", "name", "symbol")
+)
+
+# Every supported unit, keyed by its canonical id. A value in the unit maps to
+# the base unit of its dimension (W, J, L/min, L, K) as: base = value * scale + offset.
+# Scales and offsets are exact so derived factors carry no accumulated rounding.
+_UNIT_DEFINITIONS = (
+    # (canonical id, dimension, scale, offset, display name, symbol, accepted spellings)
+    ("W", POWER, 1, 0, "Watts", "W", ("W", "WATT", "WATTS")),
+    ("KW", POWER, 1000, 0, "Kilowatts", "kW", ("KW", "KILOWATT", "KILOWATTS")),
+    ("WH", ENERGY, 3600, 0, "Watt-hours", "Wh", ("WH", "WATTHOUR", "WATTHOURS")),
+    ("KWH", ENERGY, 3600000, 0, "Kilowatt-hours", "kWh",
+     ("KWH", "KILOWATTHOUR", "KILOWATTHOURS")),
+    ("J", ENERGY, 1, 0, "Joules", "J", ("J", "JOULE", "JOULES")),
+    ("KJ", ENERGY, 1000, 0, "Kilojoules", "kJ", ("KJ", "KILOJOULE", "KILOJOULES")),
+    ("MJ", ENERGY, 1000000, 0, "Megajoules", "MJ", ("MJ", "MEGAJOULE", "MEGAJOULES")),
+    ("GJ", ENERGY, 1000000000, 0, "Gigajoules", "GJ", ("GJ", "GIGAJOULE", "GIGAJOULES")),
+    # 1 BTU = 1055.06 J
+    ("BTU", ENERGY, Fraction("1055.06"), 0, "BTU", "BTU",
+     ("BTU", "BTUS", "BRITISHTHERMALUNIT", "BRITISHTHERMALUNITS")),
+    ("LPM", FLOW, 1, 0, "L/min", "L/min", ("LPM", "LMIN", "LPERMIN")),
+    # 1 GPM = 3.78541 L/min
+    ("GPM", FLOW, Fraction("3.78541"), 0, "GPM", "gal/min", ("GPM", "GALMIN", "GALPERMIN")),
+    ("L", VOLUME, 1, 0, "Liters", "L", ("L", "LITER", "LITERS", "LITRE", "LITRES")),
+    ("ML", VOLUME, Fraction(1, 1000), 0, "Milliliters", "mL",
+     ("ML", "MILLILITER", "MILLILITERS", "MILLILITRE", "MILLILITRES")),
+    ("M3", VOLUME, 1000, 0, "Cubic meters", "m³", ("M3", "CUBICMETER", "CUBICMETERS")),
+    # 1 gal = 3.78541 L, matching GPM
+    ("GAL", VOLUME, Fraction("3.78541"), 0, "Gallons", "gal", ("GAL", "GALLON", "GALLONS")),
+    ("C", TEMPERATURE, 1, Fraction("273.15"), "Celsius", "°C", ("C", "CELSIUS")),
+    ("F", TEMPERATURE, Fraction(5, 9), Fraction("273.15") - Fraction(160, 9), "Fahrenheit", "°F",
+     ("F", "FAHRENHEIT")),
+    ("K", TEMPERATURE, 1, 0, "Kelvin", "K", ("K", "KELVIN")),
+)
+
+# Base value of the point offset conversions pivot around in each dimension
+# (0 °C for temperature). A conversion subtracts the source unit's reading of
+# that point, scales, then adds the target unit's reading: °F -> °C is
+# (v - 32) * 5/9 + 0, the same operations as the formula written by hand, so
+# results such as 212 °F -> 100 °C come out exact.
+_ZERO_POINTS = {TEMPERATURE: Fraction("273.15")}
+
+# Factors of conversions the filters have always applied with their own
+# constants or operation order, as (multiply, divide). Every other pair
+# multiplies by the numerator and divides by the denominator of its exact
+# ratio, which reproduces the historical results for the remaining pairs.
+_LEGACY_FACTORS = {
+    ("KJ", "WH"): (1000, 3600),
+    ("MJ", "WH"): (1000000, 3600),
+    ("GJ", "WH"): (1000000000, 3600),
+    ("MJ", "KWH"): (1, Fraction("3.6")),
+    ("GJ", "KWH"): (1000, Fraction("3.6")),
+    ("J", "BTU"): (1, Fraction("1055.06")),
+    ("KJ", "BTU"): (1000, Fraction("1055.06")),
+    ("MJ", "BTU"): (1000000, Fraction("1055.06")),
+    ("GJ", "BTU"): (1000000000, Fraction("1055.06")),
+    ("BTU", "J"): (Fraction("1055.06"), 1),
+    # 1 Wh = 3.41214 BTU and 1 kWh = 3412.14 BTU, as published, rather than
+    # derived from 1055.06 J
+    ("WH", "BTU"): (Fraction("3.41214"), 1),
+    ("KWH", "BTU"): (Fraction("3412.14"), 1),
+    ("BTU", "WH"): (1, Fraction("3.41214")),
+    ("BTU", "KWH"): (1, Fraction("3412.14")),
+    # 1 L/min = 0.264172 GPM, as published
+    ("LPM", "GPM"): (Fraction("0.264172"), 1),
+    ("GPM", "LPM"): (Fraction("3.78541"), 1),
+}
+
+def _build_registry():
+    """
+    Build the unit lookup tables once at import time.
+
+    Returns:
+        Tuple of (units, aliases, conversions) where units maps canonical id to
+        UnitDefinition, aliases maps a normalized spelling to its canonical id and
+        conversions maps (from id, to id) to the (pre, multiply, divide, post)
+        of that conversion, applied as (value + pre) * multiply / divide + post
+    """
+    units = {}
+    aliases = {}
+    for unit, dimension, scale, offset, name, symbol, spellings in _UNIT_DEFINITIONS:
+        units[unit] = UnitDefinition(
+            unit, dimension, Fraction(scale), Fraction(offset), name, symbol
+        )
+        for spelling in spellings:
+            aliases[spelling] = unit
+
+    # Reading of the dimension's zero point in each unit
+    zeros = {
+        definition.unit: (_ZERO_POINTS.get(definition.dimension, 0) - definition.offset)
+        / definition.scale
+        for definition in units.values()
+    }
+
+    conversions = {}
+    for src in units.values():
+        for dst in units.values():
+            if src.dimension != dst.dimension:
+                continue
+            if src is dst:
+                conversions[src.unit, dst.unit] = (0.0, 1.0, 1.0, 0.0)
+                continue
+            # dst = (src - src zero) * src.scale / dst.scale + dst zero
+            ratio = src.scale / dst.scale
+            multiply, divide = _LEGACY_FACTORS.get(
+                (src.unit, dst.unit), (ratio.numerator, ratio.denominator)
+            )
+            conversions[src.unit, dst.unit] = (
+                float(-zeros[src.unit]),
+                float(multiply),
+                float(divide),
+                float(zeros[dst.unit]),
+            )
+    return units, aliases, conversions
+
+_UNITS, _UNIT_ALIASES, _CONVERSIONS = _build_registry()
+
+# Base unit id of each dimension: the unit with scale 1 and no offset
+_BASE_UNITS = {
+    definition.dimension: definition.unit
+    for definition in _UNITS.values()
+    if definition.scale == 1 and definition.offset == 0
+}
+
+# Rate dimension of each total dimension, with the seconds in the time unit of the
+# rate's base unit: integrating W over seconds gives J, L/min over minutes gives L
+_RATE_DIMENSIONS = {
+    ENERGY: (POWER, 1.0),
+    VOLUME: (FLOW, 60.0),
+}
+
+# Total dimension of each rate dimension
+_TOTAL_DIMENSIONS = {rate: total for total, (rate, _) in _RATE_DIMENSIONS.items()}
+
+# Applied to raw unit strings in a single pass: drops separators and degree
+# signs, folds unicode look-alikes to one spelling and upper-cases ASCII.
+_UNIT_TRANSLATION = str.maketrans({
+    **{char: None for char in " \t\r\n_-/°º˚"},
+    **{chr(code): chr(code - 32) for code in range(ord("a"), ord("z") + 1)},
+    "μ": "µ",  # Greek small mu -> micro sign
+    "³": "3",
+    "²": "2",
+    "℃": "C",
+    "℉": "F",
+    "\u212a": "K",  # Kelvin sign
+})
+
+# Distinct unit strings seen in practice are few, so a small cache holds them all
+_UNIT_CACHE_SIZE = 256
+
+@lru_cache(maxsize=_UNIT_CACHE_SIZE)
+def _canonical_unit(u_str):
+    """
+    Map a raw unit string to its canonical unit id.
+
+    Results are kept in a bounded LRU cache, so repeated spellings such as 'kW'
+    or '°C' cost a single dict lookup. Hit/miss counters are available from
+    _canonical_unit.cache_info().
+
+    Args:
+        u_str: Unit as written by the user or reported by an entity (e.g., 'kW')
+
+    Returns:
+        Canonical unit id, or None if the unit is unknown
+    """
+    return _UNIT_ALIASES.get(u_str.translate(_UNIT_TRANSLATION))
+
+def _lookup_unit(u_str, dimension):
+    """
+    Resolve a unit string to its canonical id within a dimension.
+
+    Args:
+        u_str: Unit as written by the user or reported by an entity (e.g., 'kW')
+        dimension: Dimension the unit must belong to
+
+    Returns:
+        Canonical unit id, or None if the unit is unknown for this dimension
+    """
+    unit = _canonical_unit(u_str if isinstance(u_str, str) else str(u_str))
+    if unit is None or _UNITS[unit].dimension != dimension:
+        return None
+    return unit
+
+# Format specs rounding results to the configured significant digits, keyed by
+# dimension; set from significant_digits and dimension_significant_digits
+_ROUND_SPECS = {}
+
+# Whether the significant digits have been configured; literals are only
+# folded into templates once they have, as a folded value cannot be re-rounded
+_ROUND_SPECS_LOADED = False
+
+def _round_spec(target):
+    """Return the format spec rounding results in target, or None for full precision."""
+    return _ROUND_SPECS.get(_UNITS[target].dimension)
+
+# Compiled converter closures keyed by (from id, to id), filled on first use
+_CONVERTERS = {}
+
+# Converters without output rounding, for internal arithmetic such as integration
+_EXACT_CONVERTERS = {}
+
+def _compile_conversion(conversion, spec=None):
+    """
+    Build the closure applying a (pre, multiply, divide, post) conversion.
+
+    Only the operations the conversion needs are compiled in. When spec is
+    given the result is rounded with it: formatting with a precomputed
+    '.<n>g' spec and parsing the result back is faster than round() with a
+    per-value digit count.
+
+    Args:
+        conversion: (pre, multiply, divide, post) from the unit registry
+        spec: Optional '.<n>g' format spec to round results to
+
+    Returns:
+        Function taking a float and returning it converted
+    """
+    pre, multiply, divide, post = conversion
+    if pre or post:
+        def convert(v):
+            return (v + pre) * multiply / divide + post
+    elif divide == 1.0:
+        if multiply == 1.0:
+            def convert(v):
+                return v
+        else:
+            def convert(v):
+                return v * multiply
+    elif multiply == 1.0:
+        def convert(v):
+            return v / divide
+    else:
+        def convert(v):
+            return v * multiply / divide
+    if spec is None:
+        return convert
+
+    def rounded(v):
+        return float(format(convert(v), spec))
+    return rounded
+
+def _compile_converter(from_unit, to_unit, exact=False):
+    """
+    Build a converter closure for a pair of canonical unit ids.
+
+    Args:
+        from_unit: Canonical id of the source unit
+        to_unit: Canonical id of the target unit (same dimension)
+        exact: If True, never round the result to the configured significant digits
+
+    Returns:
+        Function taking a float in from_unit and returning it in to_unit
+    """
+    spec = None if exact else _round_spec(to_unit)
+    return _compile_conversion(_CONVERSIONS[from_unit, to_unit], spec)
+
+def _get_converter(from_unit, to_unit, exact=False):
+    """
+    Return the cached converter for a pair of canonical unit ids.
+
+    Each pair is compiled once; later calls are a single dict lookup. With
+    exact=True the converter does not round to the configured significant
+    digits.
+    """
+    cache = _EXACT_CONVERTERS if exact else _CONVERTERS
+    converter = cache.get((from_unit, to_unit))
+    if converter is None:
+        converter = cache[from_unit, to_unit] = _compile_converter(from_unit, to_unit, exact)
+    return converter
+
+def _set_significant_digits(default, by_dimension):
+    """
+    Configure the significant digits conversion results are rounded to.
+
+    Compiled converters and template call sites are rebuilt to match, and
+    templates cached by the extended environments are dropped so literals
+    are folded again with the new digits.
+
+    Args:
+        default: Digits for every dimension, or None for full precision
+        by_dimension: Dict overriding the digits of single dimensions
+    """
+    global _ROUND_SPECS_LOADED
+    _ROUND_SPECS_LOADED = True
+    _ROUND_SPECS.clear()
+    for dimension in _BASE_UNITS:
+        digits = by_dimension.get(dimension, default)
+        if digits is not None:
+            _ROUND_SPECS[dimension] = f".{digits}g"
+    _CONVERTERS.clear()
+    for extension in list(_EXTENSIONS):
+        extension.recompile_call_sites()
+        if extension.environment.cache is not None:
+            extension.environment.cache.clear()
+
+def _convert_to(filter_name, value, from_unit, target, default_unit, errors=None,
+                as_dict=False, precision=None, fmt=None):
+    """
+    Shared implementation behind every conversion filter.
+
+    Args:
+        filter_name: Name of the calling filter, used in log messages
+        value: Numeric value to convert or entity ID, a list/tuple of them, or an
+               array.array / NumPy array of numbers
+        from_unit: Source unit, or None to use the entity's unit / default_unit
+        target: Canonical id of the unit to convert to
+        default_unit: Canonical id assumed when no unit is given, or when it is
+                      unknown under the 'warn' policy. If None, a missing or unknown
+                      unit fails the conversion
+        errors: Error policy spec, or None for the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by item instead of a list
+        precision: Decimal places to round the result to, or None
+        fmt: Format spec or format string to render the result with, or None
+
+    Returns:
+        Converted value, or the error policy's result if the conversion fails
+
+    Raises:
+        ValueError: If errors is not a valid policy, whether or not the
+                    conversion fails
+    """
+    if errors is not None:
+        _compile_error_policy(errors)
+    if precision is not None or fmt is not None:
+        result = _convert_to(filter_name, value, from_unit, target, default_unit, errors,
+                             as_dict)
+        return _format_result(filter_name, result, target, precision, fmt, errors)
+
+    value_type = type(value)
+    if value_type is list or value_type is tuple:
+        results = _convert_many(filter_name, value, from_unit, target, default_unit, errors)
+        if as_dict:
+            return dict(zip(value, results))
+        return results if value_type is list else tuple(results)
+    if value_type is array or (np is not None and value_type is np.ndarray):
+        return _convert_array(filter_name, value, from_unit, target, default_unit, errors)
+    if value_type is Quantity:
+        # The quantity's unit is already canonical and takes precedence over from_unit
+        if _UNITS[value.unit].dimension is not _UNITS[target].dimension:
+            return _get_error_policy(errors)(
+                filter_name, f"Cannot convert unit to {_UNITS[target].name}", value.unit, value
+            )
+        return _get_converter(value.unit, target)(value.value)
+
+    # Resolve entity ID to value and unit if applicable
+    v, u_str = _resolve_value_and_unit(value, from_unit)
+
+    number = _parse_number(v)
+    if number is None:
+        # Missing readings are expected (e.g. during startup), not an error
+        if _is_sentinel(v):
+            return _unavailable_default
+        if v is _ENTITY_NOT_FOUND:
+            reason = "Entity not found"
+        elif v is not value:
+            reason = "Entity state is not numeric"
+        else:
+            reason = "Unable to convert value to float"
+        return _get_error_policy(errors)(filter_name, reason, value, value)
+    v = number
+
+    if u_str:
+        unit = _lookup_unit(u_str, _UNITS[target].dimension)
+        if unit is None:
+            on_error = _get_error_policy(errors)
+            if default_unit is None or on_error is not _warn_policy:
+                return on_error(filter_name, f"Cannot convert unit to {_UNITS[target].name}",
+                                u_str, v)
+            _WARNINGS.warn(filter_name, f"Unknown unit, treating as {_UNITS[default_unit].name}",
+                           u_str)
+            unit = default_unit
+    elif default_unit is None:
+        return _get_error_policy(errors)(filter_name, "No source unit given", value, v)
+    else:
+        unit = default_unit
+
+    return _get_converter(unit, target)(v)
+
+def _convert_many(filter_name, values, from_unit, target, default_unit, errors):
+    """
+    Convert a list or tuple of values and entity IDs in one pass.
+
+    Items are resolved and parsed, then grouped by source unit, so each unit is
+    canonicalized and its converter looked up once per call. Items that fail to
+    parse or whose unit cannot be resolved take the single-value path, which
+    applies the error policy exactly as for one value.
+
+    Returns:
+        List of converted values, in the order of values
+    """
+    # Plain numbers in one known unit take a single tight loop
+    if all(type(v) is float or type(v) is int for v in values):
+        unit = _numbers_unit(from_unit, target, default_unit)
+        if unit is not None:
+            return list(map(_get_converter(unit, target), map(float, values)))
+
+    results = [None] * len(values)
+    groups = {}
+    for index, value in enumerate(values):
+        v, u_str = _resolve_value_and_unit(value, from_unit)
+        number = _parse_number(v)
+        if number is None:
+            results[index] = _convert_to(
+                filter_name, value, from_unit, target, default_unit, errors
+            )
+            continue
+        group = groups.get(u_str)
+        if group is None:
+            group = groups[u_str] = ([], [])
+        group[0].append(index)
+        group[1].append(number)
+
+    dimension = _UNITS[target].dimension
+    for u_str, (indexes, numbers) in groups.items():
+        if u_str:
+            unit = _lookup_unit(u_str, dimension)
+        else:
+            unit = default_unit
+        if unit is None:
+            for index in indexes:
+                results[index] = _convert_to(
+                    filter_name, values[index], from_unit, target, default_unit, errors
+                )
+            continue
+        converter = _get_converter(unit, target)
+        for index, number in zip(indexes, map(converter, numbers)):
+            results[index] = number
+    return results
+
+def _numbers_unit(from_unit, target, default_unit):
+    """
+    Return the canonical unit plain numbers given in from_unit are read in.
+
+    Returns:
+        The unit id, or None if from_unit cannot be resolved without going
+        through the error policy (unknown unit, or no unit and no default)
+    """
+    if from_unit:
+        return _lookup_unit(from_unit, _UNITS[target].dimension)
+    return default_unit
+
+def _numbers_conversion(from_unit, target, default_unit):
+    """Return the (pre, multiply, divide, post) applied to plain numbers given in from_unit."""
+    unit = _numbers_unit(from_unit, target, default_unit)
+    return None if unit is None else _CONVERSIONS[unit, target]
+
+def _convert_array(filter_name, values, from_unit, target, default_unit, errors):
+    """
+    Convert an array.array or NumPy array of numbers in one vectorized pass.
+
+    NumPy arrays, and array.array when NumPy is installed, are converted with
+    NumPy arithmetic; otherwise a single comprehension fills the new array.
+    Float arrays keep their typecode or dtype, integer arrays become double.
+
+    Returns:
+        Array of the input's type, or a list with each item's result when the
+        unit cannot be resolved directly (the error policy then applies per item)
+    """
+    unit = _numbers_unit(from_unit, target, default_unit)
+    is_array = type(values) is array
+    numeric = values.typecode != "u" if is_array else values.dtype.kind in "biuf"
+    if unit is None or not numeric:
+        return _convert_many(filter_name, values.tolist(), from_unit, target, default_unit,
+                             errors)
+
+    conversion = _CONVERSIONS[unit, target]
+    spec = _round_spec(target)
+    if is_array:
+        typecode = values.typecode if values.typecode in "fd" else "d"
+        if np is None:
+            return array(typecode, map(_get_converter(unit, target), map(float, values)))
+        # Shares the array's buffer; only the result is allocated
+        numbers = np.frombuffer(values, dtype=values.typecode) if len(values) else np.empty(0)
+        converted = _convert_ndarray(numbers.astype(float, copy=False), conversion)
+        if spec is not None:
+            converted = _round_significant_array(converted, spec)
+        result = array(typecode)
+        result.frombytes(converted.astype(typecode).tobytes())
+        return result
+
+    result = _convert_ndarray(values if values.dtype.kind == "f" else values.astype(float),
+                              conversion)
+    if result is values:
+        # Identity conversion; never hand out the caller's array
+        result = values.copy()
+    if spec is not None:
+        result = _round_significant_array(result, spec)
+    return result.astype(values.dtype, copy=False) if values.dtype.kind == "f" else result
+
+def _convert_ndarray(values, conversion):
+    """Apply a (pre, multiply, divide, post) conversion to a NumPy float array."""
+    pre, multiply, divide, post = conversion
+    if pre:
+        values = values + pre
+    if multiply != 1.0:
+        values = values * multiply
+    if divide != 1.0:
+        values = values / divide
+    if post:
+        values = values + post
+    return values
+
+def _round_significant_array(values, spec):
+    """Round a NumPy float array to the significant digits of a '.<n>g' spec."""
+    digits = int(spec[1:-1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude = np.floor(np.log10(np.abs(values)))
+        factor = 10.0 ** (digits - 1 - np.where(np.isfinite(magnitude), magnitude, 0))
+        return np.where(np.isfinite(values), np.round(values * factor) / factor, values)
+
+# Compiled formatters keyed by fmt string, filled on first use
+_FORMATTERS = {}
+
+def _compile_formatter(fmt):
+    """
+    Build the function formatting a number and unit symbol for a fmt string.
+
+    A fmt without braces is a format spec for the number (e.g., '.2f'). A fmt
+    with braces is a format string whose {value} (or {}) and {unit} fields
+    are filled in; it is parsed once here instead of on every call.
+
+    Returns:
+        Function (value, symbol) -> str
+
+    Raises:
+        ValueError: If fmt is not a valid format
+    """
+    if "{" not in fmt and "}" not in fmt:
+        format(0.0, fmt)  # Raises ValueError for an invalid spec
+        def formatter(value, symbol):
+            return format(value, fmt)
+        return formatter
+
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(fmt):
+        if literal:
+            parts.append((literal, None, None))
+        if field is None:
+            continue
+        if conversion or field not in ("", "value", "unit"):
+            raise ValueError(f"Unsupported field '{{{field}}}' in format '{fmt}'")
+        format(0.0 if field != "unit" else "", spec)  # Raises ValueError for an invalid spec
+        parts.append((None, field == "unit", spec))
+
+    def formatter(value, symbol):
+        return "".join([
+            literal if literal is not None else format(symbol if is_unit else value, spec)
+            for literal, is_unit, spec in parts
+        ])
+    return formatter
+
+def _format_result(filter_name, result, target, precision, fmt, errors):
+    """
+    Round and/or format a conversion result, item by item for containers.
+
+    Results that are not numbers (e.g. None from a failed conversion) are
+    returned unchanged.
+    """
+    formatter = None
+    if fmt is not None:
+        formatter = _FORMATTERS.get(fmt)
+        if formatter is None:
+            try:
+                formatter = _FORMATTERS[fmt] = _compile_formatter(str(fmt))
+            except ValueError:
+                return _get_error_policy(errors)(filter_name, "Invalid format", fmt, result)
+    symbol = _UNITS[target].symbol
+
+    def finish(value):
+        if type(value) is not float:
+            return value
+        if precision is not None:
+            value = round(value, precision)
+        return value if formatter is None else formatter(value, symbol)
+
+    result_type = type(result)
+    if result_type is float:
+        return finish(result)
+    if result_type is list:
+        return [finish(value) for value in result]
+    if result_type is tuple:
+        return tuple(finish(value) for value in result)
+    if result_type is dict:
+        return {key: finish(value) for key, value in result.items()}
+    if result_type is array or (np is not None and result_type is np.ndarray):
+        if formatter is None:
+            if result_type is array:
+                return array(result.typecode, [round(value, precision) for value in result])
+            return result.round(precision)
+        return [finish(float(value)) for value in result]
+    return result
+
+# ========== GENERIC CONVERSION ==========
+
+def convert(value, from_unit=None, to_unit=None, errors=None, as_dict=False,
+            precision=None, fmt=None):
+    """
+    Convert value between any two units of the same dimension.
+    
+    Args:
+        value: Numeric value to convert or entity ID (e.g., 'sensor.power_meter'),
+               or a list/tuple of them
+        from_unit: Source unit (any supported unit). If None and value is an entity ID,
+                   uses the entity's unit_of_measurement
+        to_unit: Target unit (any supported unit of the same dimension)
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
+    
+    Returns:
+        Converted value in to_unit, or None if conversion fails
+    
+    Example:
+        {{ 5 | convert('kW', 'W') }}  -> 5000.0
+        {{ 212 | convert('°F', '°C') }} -> 100.0
+        {{ 'sensor.energy_meter' | convert(to_unit='MJ') }}  -> converts using sensor's unit
+        {{ ['sensor.pv', 'sensor.grid'] | convert(to_unit='kW', as_dict=True) }}
+            -> {'sensor.pv': ..., 'sensor.grid': ...}
+    """
+    target = _canonical_unit(to_unit if isinstance(to_unit, str) else str(to_unit))
+    if target is None:
+        return _get_error_policy(errors)("convert", "Unknown target unit", to_unit, value)
+    return _convert_to("convert", value, from_unit, target, None, errors, as_dict,
+                       precision, fmt)
+
+def convert_fields(records, fields, from_unit, to_unit, materialize=False, errors=None):
+    """
+    Convert chosen fields of a list of records, such as forecast attributes.
+    
+    Records are produced lazily, one plain dict per record as it is iterated:
+    a shallow copy of the original record with the converted fields replaced.
+    Fields that are missing or not numeric are left unchanged. The conversion
+    is resolved once for all records. Items that are not records (dicts) are
+    replaced by the error policy's result.
+    
+    Args:
+        records: Iterable of dicts (e.g., state_attr('weather.home', 'forecast'))
+        fields: Name of the field to convert, or a list of names
+        from_unit: Unit the fields are given in (any supported unit)
+        to_unit: Target unit (any supported unit of the same dimension)
+        materialize: If True, return a list of plain dicts instead of a
+                     generator, e.g. to store or iterate the result more than once
+        errors: Error policy for an unknown or mismatched unit or an item that
+                is not a record ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+    
+    Returns:
+        Generator (or list) of converted records, or the error policy's result
+        if records is not a list or the units cannot be converted
+    
+    Example:
+        {{ state_attr('weather.home', 'forecast')
+           | convert_fields(['temperature', 'templow'], '°C', '°F') | list }}
+    """
+    if errors is not None:
+        _compile_error_policy(errors)
+    # e.g. None from state_attr() for a missing attribute, or a single record
+    if isinstance(records, (str, bytes, Mapping)) or not hasattr(records, "__iter__"):
+        return _get_error_policy(errors)("convert_fields", "Not a list of records", records,
+                                         records)
+    target = _canonical_unit(to_unit if isinstance(to_unit, str) else str(to_unit))
+    if target is None:
+        return _get_error_policy(errors)("convert_fields", "Unknown target unit", to_unit, records)
+    unit = _lookup_unit(from_unit, _UNITS[target].dimension) if from_unit else None
+    if unit is None:
+        return _get_error_policy(errors)(
+            "convert_fields", f"Cannot convert unit to {_UNITS[target].name}", from_unit, records
+        )
+    if isinstance(fields, str):
+        fields = (fields,)
+    records = _iter_converted_fields(records, tuple(fields), _get_converter(unit, target),
+                                     _get_error_policy(errors))
+    return list(records) if materialize else records
+
+def _iter_converted_fields(records, fields, converter, on_error):
+    """Yield the records of convert_fields with their fields converted."""
+    for record in records:
+        if not isinstance(record, Mapping):
+            yield on_error("convert_fields", "Not a record", record, record)
+            continue
+        overlay = {}
+        for field in fields:
+            number = _parse_number(record.get(field))
+            if number is not None:
+                overlay[field] = converter(number)
+        yield {**record, **overlay}
+
+# ========== QUANTITIES ==========
+
+class Quantity:
+    """
+    A float tagged with its canonical unit id.
+    
+    Renders as the bare number in templates. Arithmetic and comparisons with
+    another quantity convert it only when the units differ, and conversion
+    filters read the unit directly instead of parsing a unit string. Plain
+    numbers are taken to be in the quantity's unit.
+    """
+
+    __slots__ = ("value", "unit")
+
+    def __init__(self, value, unit):
+        """
+        Args:
+            value: Number in unit
+            unit: Canonical unit id (e.g., 'KW'), as returned by _canonical_unit
+        """
+        self.value = float(value)
+        self.unit = unit
+
+    @property
+    def symbol(self):
+        """Display symbol of the unit (e.g., 'kW')."""
+        return _UNITS[self.unit].symbol
+
+    def to(self, unit):
+        """
+        Return this quantity converted to another unit of the same dimension.
+        
+        Raises:
+            UnitConversionError: If unit is unknown or of another dimension
+        """
+        target = _lookup_unit(unit, _UNITS[self.unit].dimension)
+        if target is None:
+            raise UnitConversionError(f"Cannot convert {self.symbol} to {unit!r}")
+        return Quantity(_get_converter(self.unit, target)(self.value), target)
+
+    def _other_value(self, other):
+        """Return other as a number in this quantity's unit, or NotImplemented."""
+        other_type = type(other)
+        if other_type is Quantity:
+            if other.unit is self.unit:
+                return other.value
+            if _UNITS[other.unit].dimension is not _UNITS[self.unit].dimension:
+                raise UnitConversionError(f"Cannot combine {other.symbol} with {self.symbol}")
+            return _get_converter(other.unit, self.unit, exact=True)(other.value)
+        if other_type is float or other_type is int:
+            return other
+        return NotImplemented
+
+    def __add__(self, other):
+        other = self._other_value(other)
+        if other is NotImplemented:
+            return other
+        return Quantity(self.value + other, self.unit)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        other = self._other_value(other)
+        if other is NotImplemented:
+            return other
+        return Quantity(self.value - other, self.unit)
+
+    def __rsub__(self, other):
+        other = self._other_value(other)
+        if other is NotImplemented:
+            return other
+        return Quantity(other - self.value, self.unit)
+
+    def __mul__(self, other):
+        if type(other) is float or type(other) is int:
+            return Quantity(self.value * other, self.unit)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if type(other) is Quantity:
+            # Ratio of two quantities of one dimension is a plain number
+            return self.value / self._other_value(other)
+        if type(other) is float or type(other) is int:
+            return Quantity(self.value / other, self.unit)
+        return NotImplemented
+
+    def __neg__(self):
+        return Quantity(-self.value, self.unit)
+
+    def __abs__(self):
+        return Quantity(abs(self.value), self.unit)
+
+    def __eq__(self, other):
+        try:
+            other = self._other_value(other)
+        except UnitConversionError:
+            return False
+        if other is NotImplemented:
+            return other
+        return self.value == other
+
+    def __lt__(self, other):
+        other = self._other_value(other)
+        return other if other is NotImplemented else self.value < other
+
+    def __le__(self, other):
+        other = self._other_value(other)
+        return other if other is NotImplemented else self.value <= other
+
+    def __gt__(self, other):
+        other = self._other_value(other)
+        return other if other is NotImplemented else self.value > other
+
+    def __ge__(self, other):
+        other = self._other_value(other)
+        return other if other is NotImplemented else self.value >= other
+
+    # Unhashable: quantities are mutable and equal plain numbers in their own
+    # unit, so no hash could agree with both 5 and 5000 W == 5 kW
+    __hash__ = None
+
+    def __float__(self):
+        return self.value
+
+    def __int__(self):
+        return int(self.value)
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __round__(self, ndigits=None):
+        return round(self.value, ndigits)
+
+    def __format__(self, spec):
+        return format(self.value, spec)
+
+    def __str__(self):
+        return str(self.value)
+
+    def __repr__(self):
+        return f"Quantity({self.value!r}, {self.symbol!r})"
+
+def quantity(value, unit=None, errors=None):
+    """
+    Tag a value with its unit, for unit-aware arithmetic in templates.
+    
+    Args:
+        value: Numeric value, entity ID (e.g., 'sensor.power_meter') or Quantity
+        unit: Unit of value (any supported unit). If None and value is an entity ID,
+              uses the entity's unit_of_measurement. For a Quantity, the unit
+              to convert it to
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+    
+    Returns:
+        Quantity, which renders as its number, or None if value has no reading
+    
+    Example:
+        {{ 5 | quantity('kW') + 500 | quantity('W') }}  -> 5.5
+        {{ 'sensor.power_meter' | quantity > 2 | quantity('kW') }}
+        {{ ('sensor.power_meter' | quantity).to('W') }}
+        {{ 5 | quantity('kW') | quantity('W') }}  -> 5000.0
+    """
+    if errors is not None:
+        _compile_error_policy(errors)
+    if type(value) is Quantity:
+        if unit is None:
+            return value
+        target = _lookup_unit(unit, _UNITS[value.unit].dimension)
+        if target is None:
+            return _get_error_policy(errors)(
+                "quantity", f"Cannot convert unit to {_UNITS[value.unit].name}", unit, value
+            )
+        return Quantity(_get_converter(value.unit, target)(value.value), target)
+    v, u_str = _resolve_value_and_unit(value, unit)
+    number = _parse_number(v)
+    if number is None:
+        if _is_sentinel(v):
+            return _unavailable_default
+        reason = "Entity not found" if v is _ENTITY_NOT_FOUND else "Unable to convert value to float"
+        return _get_error_policy(errors)("quantity", reason, value, value)
+    canonical = _canonical_unit(u_str if isinstance(u_str, str) else str(u_str)) if u_str else None
+    if canonical is None:
+        return _get_error_policy(errors)("quantity", "Unknown unit", u_str, value)
+    return Quantity(number, canonical)
+
 # ========== POWER CONVERSIONS ==========
 
-def watts(value, from_unit=None):
+def watts(value, from_unit=None, errors=None, as_dict=False,
+          precision=None, fmt=None):
     """
     Convert value to Watts from various power units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.power_meter')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.power_meter'),
+               or a list/tuple of them
         from_unit: Source unit (W, KW, KILOWATTS, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in Watts, or None if conversion fails
@@ -88,35 +1467,29 @@ def watts(value, from_unit=None):
         {{ 5 | watts('kW') }}  -> 5000.0
         {{ 1000 | watts('W') }} -> 1000.0
         {{ 'sensor.power_meter' | watts }}  -> converts using sensor's unit
+        {{ ['sensor.pv', 'sensor.grid'] | watts }}  -> one value per entity
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
-    
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("watts: Unable to convert value '%s' to float: %s", value, e)
-        return None
-    
-    # Normalize unit string
-    u = str(u_str or "W").replace(" ", "").replace("_", "").upper()
-    
-    if u in ("W", "WATT", "WATTS"):
-        return v
-    elif u in ("KW", "KILOWATT", "KILOWATTS"):
-        return v * 1000.0
-    else:
-        _LOGGER.warning("watts: Unknown unit '%s', treating as Watts", u_str)
-        return v
+    return _convert_to("watts", value, from_unit, "W", "W", errors, as_dict,
+                       precision, fmt)
 
-def kilowatts(value, from_unit=None):
+def kilowatts(value, from_unit=None, errors=None, as_dict=False,
+              precision=None, fmt=None):
     """
     Convert value to Kilowatts from various power units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.power_meter')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.power_meter'),
+               or a list/tuple of them
         from_unit: Source unit (W, KW, KILOWATTS, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in Kilowatts, or None if conversion fails
@@ -126,36 +1499,29 @@ def kilowatts(value, from_unit=None):
         {{ 2 | kilowatts('kW') }} -> 2.0
         {{ 'sensor.power_meter' | kilowatts }}  -> converts using sensor's unit
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
-    
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("kilowatts: Unable to convert value '%s' to float: %s", value, e)
-        return None
-    
-    # Normalize unit string
-    u = str(u_str or "W").replace(" ", "").replace("_", "").upper()
-    
-    if u in ("KW", "KILOWATT", "KILOWATTS"):
-        return v
-    elif u in ("W", "WATT", "WATTS"):
-        return v / 1000.0
-    else:
-        _LOGGER.warning("kilowatts: Unknown unit '%s', treating as Watts", u_str)
-        return v / 1000.0
+    return _convert_to("kilowatts", value, from_unit, "KW", "W", errors, as_dict,
+                       precision, fmt)
 
 # ========== ENERGY CONVERSIONS ==========
 
-def watt_hours(value, from_unit=None):
+def watt_hours(value, from_unit=None, errors=None, as_dict=False,
+               precision=None, fmt=None):
     """
     Convert value to Watt-hours from various energy units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.energy_meter')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.energy_meter'),
+               or a list/tuple of them
         from_unit: Source unit (Wh, kWh, J, kJ, MJ, GJ, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in Watt-hours, or None if conversion fails
@@ -165,44 +1531,27 @@ def watt_hours(value, from_unit=None):
         {{ 3600 | watt_hours('J') }} -> 1.0
         {{ 'sensor.energy_meter' | watt_hours }}  -> converts using sensor's unit
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
-    
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("watt_hours: Unable to convert value '%s' to float: %s", value, e)
-        return None
-    
-    # Normalize unit string
-    u = str(u_str or "Wh").replace(" ", "").replace("_", "").replace("-", "").upper()
-    
-    if u in ("WH", "WATTHOUR", "WATTHOURS"):
-        return v
-    elif u in ("KWH", "KILOWATTHOUR", "KILOWATTHOURS"):
-        return v * 1000.0
-    elif u in ("J", "JOULE", "JOULES"):
-        return v / 3600.0  # 1 Wh = 3600 J
-    elif u in ("KJ", "KILOJOULE", "KILOJOULES"):
-        return v * 1000.0 / 3600.0
-    elif u in ("MJ", "MEGAJOULE", "MEGAJOULES"):
-        return v * 1000000.0 / 3600.0
-    elif u in ("GJ", "GIGAJOULE", "GIGAJOULES"):
-        return v * 1000000000.0 / 3600.0
-    elif u in ("BTU", "BTUS", "BRITISHTHERMALUNIT", "BRITISHTHERMALUNITS"):
-        return v / 3.41214  # 1 Wh = 3.41214 BTU
-    else:
-        _LOGGER.warning("watt_hours: Unknown unit '%s', treating as Watt-hours", u_str)
-        return v
+    return _convert_to("watt_hours", value, from_unit, "WH", "WH", errors, as_dict,
+                       precision, fmt)
 
-def kilowatt_hours(value, from_unit=None):
+def kilowatt_hours(value, from_unit=None, errors=None, as_dict=False,
+                   precision=None, fmt=None):
     """
     Convert value to Kilowatt-hours from various energy units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.energy_meter')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.energy_meter'),
+               or a list/tuple of them
         from_unit: Source unit (Wh, kWh, J, kJ, MJ, GJ, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in Kilowatt-hours, or None if conversion fails
@@ -212,44 +1561,27 @@ def kilowatt_hours(value, from_unit=None):
         {{ 3.6 | kilowatt_hours('MJ') }} -> 1.0
         {{ 'sensor.energy_meter' | kilowatt_hours }}  -> converts using sensor's unit
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
-    
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("kilowatt_hours: Unable to convert value '%s' to float: %s", value, e)
-        return None
-    
-    # Normalize unit string
-    u = str(u_str or "Wh").replace(" ", "").replace("_", "").replace("-", "").upper()
-    
-    if u in ("KWH", "KILOWATTHOUR", "KILOWATTHOURS"):
-        return v
-    elif u in ("WH", "WATTHOUR", "WATTHOURS"):
-        return v / 1000.0
-    elif u in ("J", "JOULE", "JOULES"):
-        return v / 3600000.0  # 1 kWh = 3,600,000 J
-    elif u in ("KJ", "KILOJOULE", "KILOJOULES"):
-        return v / 3600.0  # 1 kWh = 3,600 kJ
-    elif u in ("MJ", "MEGAJOULE", "MEGAJOULES"):
-        return v / 3.6  # 1 kWh = 3.6 MJ
-    elif u in ("GJ", "GIGAJOULE", "GIGAJOULES"):
-        return v * 1000.0 / 3.6  # 1 GJ = 277.78 kWh
-    elif u in ("BTU", "BTUS", "BRITISHTHERMALUNIT", "BRITISHTHERMALUNITS"):
-        return v / 3412.14  # 1 kWh = 3412.14 BTU
-    else:
-        _LOGGER.warning("kilowatt_hours: Unknown unit '%s', treating as Watt-hours", u_str)
-        return v / 1000.0
+    return _convert_to("kilowatt_hours", value, from_unit, "KWH", "WH", errors, as_dict,
+                       precision, fmt)
 
-def joules(value, from_unit=None):
+def joules(value, from_unit=None, errors=None, as_dict=False,
+           precision=None, fmt=None):
     """
     Convert value to Joules from various energy units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.energy_meter')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.energy_meter'),
+               or a list/tuple of them
         from_unit: Source unit (J, kJ, MJ, GJ, Wh, kWh, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in Joules, or None if conversion fails
@@ -259,44 +1591,27 @@ def joules(value, from_unit=None):
         {{ 1 | joules('Wh') }} -> 3600.0
         {{ 'sensor.energy_meter' | joules }}  -> converts using sensor's unit
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
-    
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("joules: Unable to convert value '%s' to float: %s", value, e)
-        return None
-    
-    # Normalize unit string
-    u = str(u_str or "J").replace(" ", "").replace("_", "").replace("-", "").upper()
-    
-    if u in ("J", "JOULE", "JOULES"):
-        return v
-    elif u in ("KJ", "KILOJOULE", "KILOJOULES"):
-        return v * 1000.0
-    elif u in ("MJ", "MEGAJOULE", "MEGAJOULES"):
-        return v * 1000000.0
-    elif u in ("GJ", "GIGAJOULE", "GIGAJOULES"):
-        return v * 1000000000.0
-    elif u in ("WH", "WATTHOUR", "WATTHOURS"):
-        return v * 3600.0  # 1 Wh = 3600 J
-    elif u in ("KWH", "KILOWATTHOUR", "KILOWATTHOURS"):
-        return v * 3600000.0  # 1 kWh = 3,600,000 J
-    elif u in ("BTU", "BTUS", "BRITISHTHERMALUNIT", "BRITISHTHERMALUNITS"):
-        return v * 1055.06  # 1 BTU = 1055.06 J
-    else:
-        _LOGGER.warning("joules: Unknown unit '%s', treating as Joules", u_str)
-        return v
+    return _convert_to("joules", value, from_unit, "J", "J", errors, as_dict,
+                       precision, fmt)
 
-def btu_energy(value, from_unit=None):
+def btu_energy(value, from_unit=None, errors=None, as_dict=False,
+               precision=None, fmt=None):
     """
     Convert value to BTU (British Thermal Units) from various energy units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.energy_meter')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.energy_meter'),
+               or a list/tuple of them
         from_unit: Source unit (J, kJ, MJ, GJ, Wh, kWh, BTU, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in BTU, or None if conversion fails
@@ -306,46 +1621,29 @@ def btu_energy(value, from_unit=None):
         {{ 1 | btu_energy('kWh') }} -> 3412.14
         {{ 'sensor.energy_meter' | btu_energy }}  -> converts using sensor's unit
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
-    
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("btu_energy: Unable to convert value '%s' to float: %s", value, e)
-        return None
-    
-    # Normalize unit string
-    u = str(u_str or "J").replace(" ", "").replace("_", "").replace("-", "").upper()
-    
-    if u in ("BTU", "BTUS", "BRITISHTHERMALUNIT", "BRITISHTHERMALUNITS"):
-        return v
-    elif u in ("J", "JOULE", "JOULES"):
-        return v / 1055.06  # 1 BTU = 1055.06 J
-    elif u in ("KJ", "KILOJOULE", "KILOJOULES"):
-        return v * 1000.0 / 1055.06
-    elif u in ("MJ", "MEGAJOULE", "MEGAJOULES"):
-        return v * 1000000.0 / 1055.06
-    elif u in ("GJ", "GIGAJOULE", "GIGAJOULES"):
-        return v * 1000000000.0 / 1055.06
-    elif u in ("WH", "WATTHOUR", "WATTHOURS"):
-        return v * 3.41214  # 1 Wh = 3.41214 BTU
-    elif u in ("KWH", "KILOWATTHOUR", "KILOWATTHOURS"):
-        return v * 3412.14  # 1 kWh = 3412.14 BTU
-    else:
-        _LOGGER.warning("btu_energy: Unknown unit '%s', treating as Joules", u_str)
-        return v / 1055.06
+    return _convert_to("btu_energy", value, from_unit, "BTU", "J", errors, as_dict,
+                       precision, fmt)
 
 # ========== FLOW CONVERSIONS ==========
 
-def l_per_min(value, from_unit=None):
+def l_per_min(value, from_unit=None, errors=None, as_dict=False,
+              precision=None, fmt=None):
     """
     Convert value to Liters per Minute from various flow units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.water_flow')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.water_flow'),
+               or a list/tuple of them
         from_unit: Source unit (L/MIN, GPM, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in Liters per Minute, or None if conversion fails
@@ -355,34 +1653,27 @@ def l_per_min(value, from_unit=None):
         {{ 10 | l_per_min('L/MIN') }} -> 10.0
         {{ 'sensor.water_flow' | l_per_min }}  -> converts using sensor's unit
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
-    
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("l_per_min: Unable to convert value '%s' to float: %s", value, e)
-        return None
-    
-    # Normalize unit string
-    u = str(u_str or "L/MIN").replace(" ", "").replace("/", "").replace("_", "").upper()
-    
-    if u in ("LPM", "LMIN", "L/MIN", "LPERMIN"):
-        return v
-    elif u in ("GPM", "GALMIN", "GAL/MIN", "GALPERMIN"):
-        return v * 3.78541  # 1 GPM = 3.78541 L/min
-    else:
-        _LOGGER.warning("l_per_min: Unknown unit '%s', treating as L/min", u_str)
-        return v
+    return _convert_to("l_per_min", value, from_unit, "LPM", "LPM", errors, as_dict,
+                       precision, fmt)
 
-def gpm(value, from_unit=None):
+def gpm(value, from_unit=None, errors=None, as_dict=False,
+        precision=None, fmt=None):
     """
     Convert value to Gallons per Minute from various flow units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.water_flow')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.water_flow'),
+               or a list/tuple of them
         from_unit: Source unit (L/MIN, GPM, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in Gallons per Minute, or None if conversion fails
@@ -392,36 +1683,29 @@ def gpm(value, from_unit=None):
         {{ 5 | gpm('GPM') }} -> 5.0
         {{ 'sensor.water_flow' | gpm }}  -> converts using sensor's unit
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
-    
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("gpm: Unable to convert value '%s' to float: %s", value, e)
-        return None
-    
-    # Normalize unit string
-    u = str(u_str or "L/MIN").replace(" ", "").replace("/", "").replace("_", "").upper()
-    
-    if u in ("GPM", "GALMIN", "GAL/MIN", "GALPERMIN"):
-        return v
-    elif u in ("LPM", "LMIN", "L/MIN", "LPERMIN"):
-        return v * 0.264172  # 1 L/min = 0.264172 GPM
-    else:
-        _LOGGER.warning("gpm: Unknown unit '%s', treating as L/min", u_str)
-        return v * 0.264172
+    return _convert_to("gpm", value, from_unit, "GPM", "LPM", errors, as_dict,
+                       precision, fmt)
 
 # ========== TEMPERATURE CONVERSIONS ==========
 
-def celsius(value, from_unit="F"):
+def celsius(value, from_unit="F", errors=None, as_dict=False,
+            precision=None, fmt=None):
     """
     Convert value to Celsius from various temperature units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.outdoor_temperature')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.outdoor_temperature'),
+               or a list/tuple of them
         from_unit: Source unit (C, F, K, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in Celsius, or None if conversion fails
@@ -431,36 +1715,27 @@ def celsius(value, from_unit="F"):
         {{ 273.15 | celsius('K') }} -> 0.0
         {{ 'sensor.outdoor_temperature' | celsius }}  -> converts using sensor's unit
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
-    
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("celsius: Unable to convert value '%s' to float: %s", value, e)
-        return None
-    
-    # Normalize unit string
-    u = str(u_str or "C").replace("°", "").replace(" ", "").upper().strip()
-    
-    if u in ("C", "CELSIUS"):
-        return v
-    elif u in ("F", "FAHRENHEIT"):
-        return (v - 32.0) * 5.0 / 9.0
-    elif u in ("K", "KELVIN"):
-        return v - 273.15
-    else:
-        _LOGGER.warning("celsius: Unknown unit '%s', treating as Celsius", u_str)
-        return v
+    return _convert_to("celsius", value, from_unit, "C", "C", errors, as_dict,
+                       precision, fmt)
 
-def fahrenheit(value, from_unit=None):
+def fahrenheit(value, from_unit=None, errors=None, as_dict=False,
+               precision=None, fmt=None):
     """
     Convert value to Fahrenheit from various temperature units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.outdoor_temperature')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.outdoor_temperature'),
+               or a list/tuple of them
         from_unit: Source unit (C, F, K, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in Fahrenheit, or None if conversion fails
@@ -470,36 +1745,27 @@ def fahrenheit(value, from_unit=None):
         {{ 273.15 | fahrenheit('K') }} -> 32.0
         {{ 'sensor.outdoor_temperature' | fahrenheit }}  -> converts using sensor's unit
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
-    
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("fahrenheit: Unable to convert value '%s' to float: %s", value, e)
-        return None
-    
-    # Normalize unit string
-    u = str(u_str or "C").replace("°", "").replace(" ", "").upper().strip()
-    
-    if u in ("F", "FAHRENHEIT"):
-        return v
-    elif u in ("C", "CELSIUS"):
-        return v * 9.0 / 5.0 + 32.0
-    elif u in ("K", "KELVIN"):
-        return (v - 273.15) * 9.0 / 5.0 + 32.0
-    else:
-        _LOGGER.warning("fahrenheit: Unknown unit '%s', treating as Celsius", u_str)
-        return v * 9.0 / 5.0 + 32.0
+    return _convert_to("fahrenheit", value, from_unit, "F", "C", errors, as_dict,
+                       precision, fmt)
 
-def kelvin(value, from_unit=None):
+def kelvin(value, from_unit=None, errors=None, as_dict=False,
+           precision=None, fmt=None):
     """
     Convert value to Kelvin from various temperature units.
     
     Args:
-        value: Numeric value to convert or entity ID (e.g., 'sensor.outdoor_temperature')
+        value: Numeric value to convert or entity ID (e.g., 'sensor.outdoor_temperature'),
+               or a list/tuple of them
         from_unit: Source unit (C, F, K, etc.). If None and value is an entity ID,
                    uses the entity's unit_of_measurement
+        errors: Error policy for this call ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict'). Defaults to the configured error_policy
+        as_dict: For a list/tuple value, return a dict keyed by each item (entity ID
+                 or value) instead of a list
+        precision: Round the result to this many decimal places
+        fmt: Return the result as a string, formatted with a format spec for the
+             number (e.g., '.2f') or a format string with {value} and {unit}
+             fields (e.g., '{value:.1f} {unit}')
     
     Returns:
         Converted value in Kelvin, or None if conversion fails
@@ -509,41 +1775,650 @@ def kelvin(value, from_unit=None):
         {{ 32 | kelvin('F') }} -> 273.15
         {{ 'sensor.outdoor_temperature' | kelvin }}  -> converts using sensor's unit
     """
-    # Resolve entity ID to value and unit if applicable
-    v, u_str = _resolve_value_and_unit(value, from_unit)
+    return _convert_to("kelvin", value, from_unit, "K", "C", errors, as_dict,
+                       precision, fmt)
+
+# ========== ENTITY INDEX ==========
+
+class _UnitIndex:
+    """
+    Incremental index of entities by dimension and canonical unit.
+
+    Entities are filed under the unit of their unit_of_measurement attribute
+    and moved only when it changes, so listing every power sensor costs a
+    dict walk over the matching entities instead of a scan of all states.
+    """
+
+    def __init__(self):
+        self._entity_units = {}
+        self._by_dimension = {}
+        self._domains = {}
+
+    def update(self, entity_id, state):
+        """
+        File entity_id under the unit of its new state.
+
+        Args:
+            entity_id: Entity whose state changed
+            state: New State object, or None if the entity was removed
+        """
+        unit = None
+        if state is not None:
+            u_str = state.attributes.get("unit_of_measurement")
+            if isinstance(u_str, str):
+                unit = _canonical_unit(u_str)
+        old_unit = self._entity_units.get(entity_id)
+        if unit == old_unit:
+            return
+
+        domain = entity_id.partition(".")[0]
+        if old_unit is not None:
+            members = self._by_dimension[_UNITS[old_unit].dimension][old_unit]
+            del members[entity_id]
+            del self._entity_units[entity_id]
+            self._domains[domain] -= 1
+            if not self._domains[domain]:
+                del self._domains[domain]
+        if unit is not None:
+            units = self._by_dimension.setdefault(_UNITS[unit].dimension, {})
+            units.setdefault(unit, {})[entity_id] = None
+            self._entity_units[entity_id] = unit
+            self._domains[domain] = self._domains.get(domain, 0) + 1
+
+    def rebuild(self, states):
+        """Index all current states from scratch."""
+        self._entity_units.clear()
+        self._by_dimension.clear()
+        self._domains.clear()
+        for state in states:
+            self.update(state.entity_id, state)
+
+    def entities(self, dimension, unit=None):
+        """Return the entity IDs of a dimension, optionally only those in one unit."""
+        units = self._by_dimension.get(dimension)
+        if not units:
+            return []
+        if unit is not None:
+            return list(units.get(unit, ()))
+        return [entity_id for members in units.values() for entity_id in members]
+
+    @property
+    def domains(self):
+        """Domains with at least one indexed entity."""
+        return self._domains.keys()
+
+    def info(self):
+        """Return the number of indexed entities per dimension and unit."""
+        return {
+            dimension: {unit: len(members) for unit, members in units.items()}
+            for dimension, units in self._by_dimension.items()
+        }
+
+_UNIT_INDEX = _UnitIndex()
+
+# Entity IDs of the converted mirror, integral and derivative sensors of this
+# integration, kept by the sensor platform; all_of leaves them out by default
+_DERIVED_ENTITIES = set()
+
+def all_of(dimension, unit=None, include_derived=False):
+    """
+    List the entities reporting a dimension, from the live entity index.
     
-    try:
-        v = float(v)
-    except (ValueError, TypeError) as e:
-        _LOGGER.warning("kelvin: Unable to convert value '%s' to float: %s", value, e)
+    The template is re-rendered when entities are added to or removed from
+    the indexed domains, like iterating states.sensor would.
+    
+    Args:
+        dimension: 'power', 'energy', 'flow', 'volume' or 'temperature'
+        unit: Optional unit; only entities reporting in this unit are listed
+        include_derived: If True, also list this integration's converted
+                         mirror, integral and derivative sensors, which
+                         would otherwise double count their sources
+    
+    Returns:
+        List of entity IDs (empty if the dimension or unit is unknown)
+    
+    Example:
+        {{ all_of('power') | sum_as('kW') }}
+        {{ all_of('temperature', '°F') | count }}
+    """
+    render_info = template.render_info_cv.get()
+    if render_info is not None:
+        lifecycle = getattr(render_info, "domains_lifecycle", None)
+        if lifecycle is not None:
+            lifecycle.update(_UNIT_INDEX.domains)
+
+    if unit is not None:
+        unit = _lookup_unit(unit, str(dimension).lower())
+        if unit is None:
+            return []
+    entities = _UNIT_INDEX.entities(str(dimension).lower(), unit)
+    if include_derived or not _DERIVED_ENTITIES:
+        return entities
+    return [entity_id for entity_id in entities if entity_id not in _DERIVED_ENTITIES]
+
+# ========== AGGREGATION ==========
+
+# How aggregation filters treat members without a convertible reading
+_AGGREGATE_POLICIES = ("skip", "zero", "none")
+
+def _collect_groups(filter_name, members, target, unavailable, on_error):
+    """
+    Read aggregation members and group their numbers by canonical source unit.
+
+    Args:
+        filter_name: Name of the calling filter, used in log messages
+        members: Iterable of entity IDs or state objects (e.g. states.sensor)
+        target: Canonical id of the unit to aggregate in
+        unavailable: Policy for members without a reading ('skip', 'zero', 'none')
+        on_error: Error handler members without a convertible reading are
+                  reported to; its result is not used
+
+    Returns:
+        Tuple of (groups, missing) where groups maps a canonical unit id to the
+        list of numbers read in that unit, and missing counts members without a
+        convertible reading; None if a member is missing under the 'none' policy
+    """
+    dimension = _UNITS[target].dimension
+    groups = {}
+    units = {}
+    missing = 0
+    for member in members:
+        entity_id = member if isinstance(member, str) else getattr(member, "entity_id", None)
+        if entity_id is None:
+            on_error(filter_name, "Not an entity", member, None)
+            v = None
+        else:
+            v, u_str = _get_entity_state(entity_id)
+        number = _parse_number(v)
+        if number is not None:
+            unit = units.get(u_str, _ENTITY_NOT_FOUND)
+            if unit is _ENTITY_NOT_FOUND:
+                unit = units[u_str] = _lookup_unit(u_str, dimension) if u_str else None
+            if unit is not None:
+                group = groups.get(unit)
+                if group is None:
+                    groups[unit] = [number]
+                else:
+                    group.append(number)
+                continue
+            on_error(filter_name, f"Cannot convert unit to {_UNITS[target].name}", u_str, None)
+        elif v is _ENTITY_NOT_FOUND:
+            on_error(filter_name, "Entity not found", entity_id, None)
+        if unavailable == "none":
+            return None
+        missing += 1
+    if unavailable == "skip":
+        missing = 0
+    return groups, missing
+
+def _aggregate(filter_name, members, to_unit, unavailable, errors, reducer):
+    """
+    Shared implementation behind the aggregation filters.
+
+    Each source unit group is reduced in its own unit and converted once, using
+    the group's conversion from the unit registry.
+
+    Args:
+        errors: Error policy spec, or None for the configured error_policy
+        reducer: Function (groups, missing, target) -> result
+
+    Returns:
+        The reducer's result, or the error policy's result if the arguments are
+        invalid
+    """
+    on_error = _get_error_policy(errors)
+    target = _canonical_unit(to_unit if isinstance(to_unit, str) else str(to_unit))
+    if target is None:
+        return on_error(filter_name, "Unknown target unit", to_unit, members)
+    if unavailable not in _AGGREGATE_POLICIES:
+        return on_error(filter_name, "Invalid unavailable policy", unavailable, members)
+    # e.g. None from state_attr() for a missing attribute
+    if isinstance(members, (str, bytes)) or not hasattr(members, "__iter__"):
+        return on_error(filter_name, "Not a list of members", members, members)
+    collected = _collect_groups(filter_name, members, target, unavailable, on_error)
+    if collected is None:
         return None
+    result = reducer(collected[0], collected[1], target)
+    spec = _round_spec(target)
+    if result is None or spec is None:
+        return result
+    return float(format(result, spec))
+
+def _reduce_sum(groups, missing, target):
+    """Sum of all numbers in the target unit; missing members count as 0."""
+    total = 0.0
+    for unit, numbers in groups.items():
+        pre, multiply, divide, post = _CONVERSIONS[unit, target]
+        count = len(numbers)
+        total += (sum(numbers) + pre * count) * multiply / divide + post * count
+    return total
+
+def _reduce_mean(groups, missing, target):
+    """Mean of all numbers in the target unit; missing members count as 0."""
+    count = missing + sum(len(numbers) for numbers in groups.values())
+    return _reduce_sum(groups, missing, target) / count if count else None
+
+def _reduce_extreme(pick):
+    """Build a reducer returning the min or max of all numbers in the target unit."""
+    def reducer(groups, missing, target):
+        # Conversions are increasing, so each group's extreme converts to the extreme
+        candidates = [
+            _get_converter(unit, target, exact=True)(pick(numbers))
+            for unit, numbers in groups.items()
+        ]
+        if missing:
+            candidates.append(0.0)
+        return pick(candidates) if candidates else None
+    return reducer
+
+_reduce_min = _reduce_extreme(min)
+_reduce_max = _reduce_extreme(max)
+
+def sum_as(members, to_unit, unavailable="skip", errors=None):
+    """
+    Sum the readings of many entities in one unit.
     
-    # Normalize unit string
-    u = str(u_str or "C").replace("°", "").replace(" ", "").upper().strip()
+    Args:
+        members: Entity IDs or state objects (e.g., states.sensor), in any units
+                 of to_unit's dimension
+        to_unit: Unit of the result (any supported unit)
+        unavailable: Members without a convertible reading are ignored ('skip'),
+                     counted as 0 ('zero') or make the result None ('none')
+        errors: Error policy ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict') reporting such members, and giving the result
+                when the arguments are invalid. Defaults to the configured
+                error_policy
     
-    if u in ("K", "KELVIN"):
-        return v
-    elif u in ("C", "CELSIUS"):
-        return v + 273.15
-    elif u in ("F", "FAHRENHEIT"):
-        return (v - 32.0) * 5.0 / 9.0 + 273.15
-    else:
-        _LOGGER.warning("kelvin: Unknown unit '%s', treating as Celsius", u_str)
-        return v + 273.15
+    Returns:
+        Sum in to_unit (0.0 if no member has a reading), or the error
+        policy's result for invalid arguments
+    
+    Example:
+        {{ ['sensor.pv_power', 'sensor.grid_power'] | sum_as('kW') }}
+        {{ states.sensor | selectattr('attributes.device_class', 'eq', 'power')
+           | sum_as('W') }}
+    """
+    return _aggregate("sum_as", members, to_unit, unavailable, errors, _reduce_sum)
+
+def mean_as(members, to_unit, unavailable="skip", errors=None):
+    """
+    Average the readings of many entities in one unit.
+    
+    Args:
+        members: Entity IDs or state objects (e.g., states.sensor), in any units
+                 of to_unit's dimension
+        to_unit: Unit of the result (any supported unit)
+        unavailable: Members without a convertible reading are ignored ('skip'),
+                     counted as 0 ('zero') or make the result None ('none')
+        errors: Error policy ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict') reporting such members, and giving the result
+                when the arguments are invalid. Defaults to the configured
+                error_policy
+    
+    Returns:
+        Mean in to_unit, None if no member has a reading, or the error
+        policy's result for invalid arguments
+    
+    Example:
+        {{ ['sensor.living_room_temperature', 'sensor.bedroom_temperature']
+           | mean_as('°C') }}
+    """
+    return _aggregate("mean_as", members, to_unit, unavailable, errors, _reduce_mean)
+
+def min_as(members, to_unit, unavailable="skip", errors=None):
+    """
+    Smallest reading of many entities, in one unit.
+    
+    Args:
+        members: Entity IDs or state objects (e.g., states.sensor), in any units
+                 of to_unit's dimension
+        to_unit: Unit of the result (any supported unit)
+        unavailable: Members without a convertible reading are ignored ('skip'),
+                     counted as 0 ('zero') or make the result None ('none')
+        errors: Error policy ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict') reporting such members, and giving the result
+                when the arguments are invalid. Defaults to the configured
+                error_policy
+    
+    Returns:
+        Minimum in to_unit, None if no member has a reading, or the error
+        policy's result for invalid arguments
+    
+    Example:
+        {{ ['sensor.outdoor_temperature', 'sensor.garage_temperature'] | min_as('°F') }}
+    """
+    return _aggregate("min_as", members, to_unit, unavailable, errors, _reduce_min)
+
+def max_as(members, to_unit, unavailable="skip", errors=None):
+    """
+    Largest reading of many entities, in one unit.
+    
+    Args:
+        members: Entity IDs or state objects (e.g., states.sensor), in any units
+                 of to_unit's dimension
+        to_unit: Unit of the result (any supported unit)
+        unavailable: Members without a convertible reading are ignored ('skip'),
+                     counted as 0 ('zero') or make the result None ('none')
+        errors: Error policy ('warn', 'none', 'default=<x>', 'passthrough'
+                or 'strict') reporting such members, and giving the result
+                when the arguments are invalid. Defaults to the configured
+                error_policy
+    
+    Returns:
+        Maximum in to_unit, None if no member has a reading, or the error
+        policy's result for invalid arguments
+    
+    Example:
+        {{ ['sensor.heat_pump_power', 'sensor.oven_power'] | max_as('kW') }}
+    """
+    return _aggregate("max_as", members, to_unit, unavailable, errors, _reduce_max)
+
+# ========== DIAGNOSTICS ==========
+
+def unit_conversions_diagnostics():
+    """
+    Return runtime counters of the component for troubleshooting.
+    
+    Returns:
+        Dict with all-time warning counts, unit cache and entity cache statistics
+        and the entity index size per dimension and unit
+    
+    Example:
+        {{ unit_conversions_diagnostics().entity_cache.hit_rate }}
+    """
+    return {
+        "warnings": _WARNINGS.info(),
+        "unit_cache": _canonical_unit.cache_info()._asdict(),
+        "entity_cache": _ENTITY_CACHE.info(),
+        "entity_index": _UNIT_INDEX.info(),
+    }
+
+# ========== TEMPLATE COMPILER EXTENSION ==========
+
+# Target and default unit of each single-target filter, for compile-time resolution
+_FILTER_TARGETS = {
+    watts: ("W", "W"),
+    kilowatts: ("KW", "W"),
+    watt_hours: ("WH", "WH"),
+    kilowatt_hours: ("KWH", "WH"),
+    joules: ("J", "J"),
+    btu_energy: ("BTU", "J"),
+    l_per_min: ("LPM", "LPM"),
+    gpm: ("GPM", "LPM"),
+    celsius: ("C", "C"),
+    fahrenheit: ("F", "C"),
+    kelvin: ("K", "C"),
+}
+
+# Tokens that end an operand, making a following '+' or '-' a binary operator
+_OPERAND_END_TOKENS = frozenset(
+    (TOKEN_NAME, TOKEN_INTEGER, TOKEN_FLOAT, TOKEN_STRING, TOKEN_RPAREN, TOKEN_RBRACKET,
+     TOKEN_RBRACE)
+)
+
+# Name tokens that are operators rather than operands
+_KEYWORD_NAMES = frozenset(("and", "or", "not", "in", "is", "if", "else"))
+
+def _call_site_conversion(function, units):
+    """
+    Resolve the conversion a filter call with literal unit arguments applies.
+
+    Args:
+        function: Filter function called
+        units: Tuple of its literal string arguments (possibly empty)
+
+    Returns:
+        (pre, multiply, divide, post) applied to plain numbers, or None if the call is not a
+        conversion or its units do not resolve cleanly
+    """
+    if function is convert:
+        if len(units) != 2:
+            return None
+        target = _canonical_unit(units[1])
+        return None if target is None else _numbers_conversion(units[0], target, None)
+    spec = _FILTER_TARGETS.get(function)
+    if spec is None or len(units) > 1:
+        return None
+    from_unit = units[0] if units else function.__defaults__[0]
+    return _numbers_conversion(from_unit, spec[0], spec[1])
+
+def _call_site_target(function, units):
+    """Return the canonical target unit of a conversion filter call with literal units."""
+    if function is convert:
+        return _canonical_unit(units[1])
+    return _FILTER_TARGETS[function][0]
+
+def _compose_conversions(first, second):
+    """Return the (pre, multiply, divide, post) of applying conversion first, then second."""
+    pre, multiply, divide, post = first
+    next_pre, next_multiply, next_divide, next_post = second
+    return (
+        pre,
+        multiply * next_multiply,
+        divide * next_divide,
+        (post + next_pre) * next_multiply / next_divide + next_post,
+    )
+
+def _compile_call_site(calls, conversion):
+    """
+    Build the filter replacing a chain of conversion filter calls with literal units.
+
+    Plain numbers cost one call of the chain's composed conversion, rounded to
+    the significant digits configured for the chain's target; any other value (entity IDs, lists, strings) is passed through the
+    original filters with the same arguments.
+
+    Args:
+        calls: Tuple of (function, units) pairs, in the order they are applied
+        conversion: Composed (pre, multiply, divide, post) of the whole chain
+    """
+    def fallback(value):
+        for function, units in calls:
+            value = function(value, *units)
+        return value
+
+    convert = _compile_conversion(conversion, _round_spec(_call_site_target(*calls[-1])))
+
+    def call_site(value):
+        value_type = type(value)
+        if value_type is float:
+            return convert(value)
+        if value_type is int:
+            return convert(float(value))
+        return fallback(value)
+    return call_site
+
+# Live extensions, whose call site filters are recompiled when rounding changes
+_EXTENSIONS = weakref.WeakSet()
+
+class UnitConversionExtension(Extension):
+    """
+    Resolve conversion filters with literal units when a template is compiled.
+    
+    The token stream is rewritten before parsing:
+    
+    - A literal number piped into a conversion filter with literal (or
+      default) units, e.g. {{ 5 | watts('kW') }}, is replaced by the result.
+    - Any other value piped into such a filter, e.g. {{ x | kw('W') }}, calls a
+      filter compiled for that unit pair instead, whose converter is resolved
+      once per call site.
+    - A chain of such filters, e.g. {{ x | celsius('F') | kelvin('C') }}, is
+      fused into one call with the composed conversion, so no
+      intermediate value is computed.
+    
+    Calls whose units are not literal, do not resolve, or pass other arguments
+    are left untouched, so their behavior (including error policies) is
+    unchanged.
+
+    Folded literals and call sites are rounded to the configured significant
+    digits; call sites are recompiled when the setting changes. Templates
+    compiled before async_setup loads the setting fold nothing and look their
+    call site up on every render, so they are rounded like later templates.
+    """
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        self._call_sites = {}
+        _EXTENSIONS.add(self)
+
+    def filter_stream(self, stream):
+        """Rewrite conversion filter calls in a template's token stream."""
+        tokens = list(stream)
+        out = []
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            if token.type == TOKEN_PIPE:
+                site = self._match_call_site(tokens, index + 1)
+                if site is not None:
+                    function, units, conversion, end = site
+                    calls = [(function, units)]
+                    # Fuse the following conversion filters into the same call
+                    while end < len(tokens) and tokens[end].type == TOKEN_PIPE:
+                        site = self._match_call_site(tokens, end + 1)
+                        if site is None:
+                            break
+                        calls.append(site[:2])
+                        conversion = _compose_conversions(conversion, site[2])
+                        end = site[3]
+                    if not self._fold(out, conversion, _call_site_target(*calls[-1])):
+                        name = self._call_site_filter(tuple(calls), conversion)
+                        if not _ROUND_SPECS_LOADED:
+                            name = self._deferred_call_site_filter(name)
+                        out.append(token)
+                        out.append(Token(tokens[index + 1].lineno, TOKEN_NAME, name))
+                    index = end
+                    continue
+            out.append(token)
+            index += 1
+        return iter(out)
+
+    def _match_call_site(self, tokens, index):
+        """
+        Match a conversion filter call with only literal string arguments.
+
+        Args:
+            tokens: Token list of the template
+            index: Position of the filter name, right after the pipe
+
+        Returns:
+            (function, units, conversion, end) where end is the position after
+            the call, or None if the tokens are not such a call
+        """
+        count = len(tokens)
+        if index >= count or tokens[index].type != TOKEN_NAME:
+            return None
+        function = self.environment.filters.get(tokens[index].value)
+        if function is not convert and function not in _FILTER_TARGETS:
+            return None
+
+        units = []
+        index += 1
+        if index < count and tokens[index].type == TOKEN_LPAREN:
+            index += 1
+            while True:
+                if index + 1 >= count or tokens[index].type != TOKEN_STRING:
+                    return None
+                units.append(tokens[index].value)
+                index += 1
+                if tokens[index].type == TOKEN_RPAREN:
+                    index += 1
+                    break
+                if tokens[index].type != TOKEN_COMMA:
+                    return None
+                index += 1
+
+        units = tuple(units)
+        conversion = _call_site_conversion(function, units)
+        if conversion is None:
+            return None
+        return function, units, conversion, index
+
+    def _fold(self, out, conversion, target):
+        """
+        Replace a literal number at the end of out by its converted value in target.
+
+        Returns:
+            True if the literal was folded, False if the call must stay
+        """
+        if not _ROUND_SPECS_LOADED or not out or out[-1].type not in (TOKEN_INTEGER,
+                                                                          TOKEN_FLOAT):
+            return False
+        literal = out[-1]
+        value = float(literal.value)
+        drop = 1
+        if len(out) > 1:
+            previous = out[-2]
+            if previous.type == TOKEN_DOT:
+                # Item access such as sensors.0 | kw
+                return False
+            if previous.type in (TOKEN_ADD, TOKEN_SUB):
+                before = out[-3] if len(out) > 2 else None
+                if before is not None and before.type in (TOKEN_ADD, TOKEN_SUB):
+                    return False
+                if before is None or before.type not in _OPERAND_END_TOKENS or (
+                    before.type == TOKEN_NAME and before.value in _KEYWORD_NAMES
+                ):
+                    # A unary sign binds to the literal before the filter applies
+                    if previous.type == TOKEN_SUB:
+                        value = -value
+                    drop = 2
+
+        value = _compile_conversion(conversion, _round_spec(target))(value)
+        del out[-drop:]
+        out.append(Token(literal.lineno, TOKEN_FLOAT, value))
+        return True
+
+    def _call_site_filter(self, calls, conversion):
+        """Return the name of the compiled filter for a chain of calls, registering it once."""
+        site = self._call_sites.get(calls)
+        if site is None:
+            name = f"_unit_conversions_call_site_{len(self._call_sites)}"
+            self.environment.filters[name] = _compile_call_site(calls, conversion)
+            site = self._call_sites[calls] = (name, conversion)
+        return site[0]
+
+    def _deferred_call_site_filter(self, name):
+        """
+        Return the name of a filter calling a call site filter at render time.
+
+        Jinja evaluates filters on constant operands when it compiles a template,
+        except for filters taking the context. Templates compiled before the
+        significant digits are loaded use this filter, so their results follow
+        the setting.
+        """
+        deferred = f"{name}_deferred"
+        filters = self.environment.filters
+        if deferred not in filters:
+            @pass_context
+            def call_site(context, value):
+                return filters[name](value)
+            filters[deferred] = call_site
+        return deferred
+
+    def recompile_call_sites(self):
+        """Recompile every call site filter, e.g. after the significant digits changed."""
+        for calls, (name, conversion) in self._call_sites.items():
+            self.environment.filters[name] = _compile_call_site(calls, conversion)
 
 # ========== HOME ASSISTANT SETUP ==========
 # Array of functions to add as custom filters. Creates a filter and a global macro using the functions name.
 # You can also supply a dict with "name" and "function" keys to specify a custom name for the filter/macro.
 custom_filters = [
+    convert,
+    convert_fields,
+    quantity,
     {"name": "w", "function": watts},
     {"name": "watts", "function": watts},
     {"name": "kw", "function": kilowatts},
     {"name": "kilowatts", "function": kilowatts},
     {"name": "wh", "function": watt_hours},
+    {"name": "watt_hours", "function": watt_hours},
     {"name": "kwh", "function": kilowatt_hours},
+    {"name": "kilowatt_hours", "function": kilowatt_hours},
     {"name": "j", "function": joules},
     {"name": "joules", "function": joules},
     {"name": "btu", "function": btu_energy},
+    {"name": "btu_energy", "function": btu_energy},
     {"name": "lpm", "function": l_per_min},
     {"name": "l_per_min", "function": l_per_min},
     {"name": "gpm", "function": gpm},
@@ -554,6 +2429,16 @@ custom_filters = [
     {"name": "fahrenheit", "function": fahrenheit},
     {"name": "k", "function": kelvin},
     {"name": "kelvin", "function": kelvin},
+    all_of,
+    sum_as,
+    mean_as,
+    min_as,
+    max_as,
+]
+
+# Functions only added as global macros, as they have no value to filter.
+custom_globals = [
+    unit_conversions_diagnostics,
 ]
 
 def add_custom_filter_function(custom_filter, *environments):
@@ -563,19 +2448,36 @@ def add_custom_filter_function(custom_filter, *environments):
     for env in environments:
         env.globals[name] = env.filters[name] = function
 
+def add_custom_global_function(function, *environments):
+    """Add a custom global macro to one or more Jinja2 environments"""
+    for env in environments:
+        env.globals[function.__name__] = function
+
+def add_unit_conversions(env):
+    """Add the filters, global macros and call-site extension to a Jinja2 environment"""
+    for f in custom_filters:
+        add_custom_filter_function(f, env)
+    for f in custom_globals:
+        add_custom_global_function(f, env)
+    if UnitConversionExtension.identifier not in env.extensions:
+        env.add_extension(UnitConversionExtension)
+
 def init(*args):
     """Initialize filters"""
+    global _hass_instance
     env = _TemplateEnvironment(*args)
     
-    for f in custom_filters:
-        add_custom_filter_function(f, env)
+    # Entity IDs are resolved against the hass instance templates render with
+    if getattr(env, "hass", None) is not None:
+        _hass_instance = env.hass
+    
+    add_unit_conversions(env)
 
     return env
 
 
 template.TemplateEnvironment = init
-for f in custom_filters:
-    add_custom_filter_function(f, template._NO_HASS_ENV)
+add_unit_conversions(template._NO_HASS_ENV)
 
 async def async_setup(hass, hass_config):
     """
@@ -587,12 +2489,45 @@ async def async_setup(hass, hass_config):
     Returns:
         True if setup successful
     """
-    config = hass_config.get("unit_conversions", {})
+    global _hass_instance, _unavailable_default, _error_policy
+    config = hass_config.get(DOMAIN, {})
 
-    tpl = template.Template("", hass)
+    _hass_instance = hass
+    _unavailable_default = config.get(CONF_UNAVAILABLE_DEFAULT)
+    _error_policy = _get_error_policy(config.get(CONF_ERROR_POLICY, DEFAULT_ERROR_POLICY))
 
-    for f in custom_filters:
-        add_custom_filter_function(f, tpl._env)
+    # Summarize conversion warnings once per interval
+    _WARNINGS.interval = config.get(CONF_WARNING_INTERVAL, DEFAULT_WARNING_INTERVAL)
+    async_track_time_interval(hass, _WARNINGS.flush, timedelta(seconds=_WARNINGS.interval))
+
+    # Round conversion results to the configured significant digits
+    _set_significant_digits(
+        config.get(CONF_SIGNIFICANT_DIGITS), config.get(CONF_DIMENSION_SIGNIFICANT_DIGITS, {})
+    )
+
+    # Environments created before this module was imported did not go through init()
+    add_unit_conversions(template.Template("", hass)._env)
+    for key in (template._ENVIRONMENT_LIMITED, template._ENVIRONMENT_STRICT):
+        if key in hass.data:
+            add_unit_conversions(hass.data[key])
+
+    # Keep the entity state cache and index in step with the state machine
+    _UNIT_INDEX.rebuild(hass.states.async_all())
+    hass.bus.async_listen(EVENT_STATE_CHANGED, _async_handle_state_changed)
+    _ENTITY_CACHE.clear()
+    _ENTITY_CACHE.active = True
+
+    # Converted mirror, integral and derivative sensors are set up by the sensor platform
+    hass.data[DOMAIN] = config
+    if (
+        config.get(CONF_MIRRORS)
+        or config.get(CONF_MIRROR_DEVICE_CLASSES)
+        or config.get(CONF_INTEGRALS)
+        or config.get(CONF_DERIVATIVES)
+    ):
+        hass.async_create_task(
+            discovery.async_load_platform(hass, Platform.SENSOR, DOMAIN, {}, hass_config)
+        )
 
     _LOGGER.info("Unit Conversions filters registered successfully")
     return True
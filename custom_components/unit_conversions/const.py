@@ -0,0 +1,30 @@
+"""Constants for the Unit Conversions component."""
+
+DOMAIN = "unit_conversions"
+
+CONF_ABSOLUTE_DEADBAND = "absolute_deadband"
+CONF_COALESCE_WINDOW = "coalesce_window"
+CONF_DERIVATIVES = "derivatives"
+CONF_DIMENSION_SIGNIFICANT_DIGITS = "dimension_significant_digits"
+CONF_ERROR_POLICY = "error_policy"
+CONF_INTEGRALS = "integrals"
+CONF_MIN_INTERVAL = "min_interval"
+CONF_MIRROR_DEVICE_CLASSES = "mirror_device_classes"
+CONF_MIRRORS = "mirrors"
+CONF_RELATIVE_DEADBAND = "relative_deadband"
+CONF_SIGNIFICANT_DIGITS = "significant_digits"
+CONF_TIME_WINDOW = "time_window"
+CONF_UNAVAILABLE_DEFAULT = "unavailable_default"
+CONF_WARNING_INTERVAL = "warning_interval"
+
+# Seconds between aggregated warning summaries
+DEFAULT_WARNING_INTERVAL = 60
+
+# Log an aggregated warning and fall back to the filter's default unit
+DEFAULT_ERROR_POLICY = "warn"
+
+# Riemann sum methods of integrals
+METHOD_LEFT = "left"
+METHOD_RIGHT = "right"
+METHOD_TRAPEZOIDAL = "trapezoidal"
+INTEGRATION_METHODS = (METHOD_TRAPEZOIDAL, METHOD_LEFT, METHOD_RIGHT)
@@ -0,0 +1,340 @@
+"""
+Rate and total engines for Unit Conversions.
+
+Integrate rates (power, flow) into totals (energy, volume) and differentiate
+totals back into rates for many entities at once. Per-entity numbers live in
+flat arrays of doubles indexed by slot, so memory per entity stays constant
+and one state callback per engine serves all of them.
+"""
+from abc import ABC, abstractmethod
+from array import array
+import math
+from operator import attrgetter
+
+from homeassistant.components.sensor import ATTR_STATE_CLASS, SensorStateClass
+from homeassistant.const import ATTR_UNIT_OF_MEASUREMENT, EVENT_STATE_CHANGED
+from homeassistant.core import callback
+
+try:
+    from homeassistant.const import EVENT_STATE_REPORTED
+except ImportError:  # Home Assistant before 2024.5 does not report unchanged states
+    EVENT_STATE_REPORTED = None
+
+# Time of a sample: when the state was last reported, where states carry it
+_sample_time = attrgetter("last_updated" if EVENT_STATE_REPORTED is None else "last_reported")
+
+from . import (
+    _BASE_UNITS,
+    _RATE_DIMENSIONS,
+    _TOTAL_DIMENSIONS,
+    _WARNINGS,
+    _get_converter,
+    _lookup_unit,
+    _parse_number,
+)
+from .const import METHOD_LEFT, METHOD_RIGHT, METHOD_TRAPEZOIDAL
+
+# Integration method codes, stored per slot in a bytearray
+_TRAPEZOIDAL = 0
+_LEFT = 1
+_RIGHT = 2
+
+_METHOD_CODES = {METHOD_TRAPEZOIDAL: _TRAPEZOIDAL, METHOD_LEFT: _LEFT, METHOD_RIGHT: _RIGHT}
+
+_NAN = float("nan")
+
+class _SlotEngine(ABC):
+    """
+    Shared slot bookkeeping of the rate and total engines.
+
+    Subclasses name their per-slot numeric columns in _COLUMNS; each is an
+    array('d') attribute. Slots of removed entities are reused, and state
+    changes and reports of unchanged states are routed to the slots of their
+    entity by a single callback.
+    """
+
+    _COLUMNS = ()
+
+    def __init__(self, hass):
+        """
+        Initialize the engine and start listening for state changes and reports.
+
+        Args:
+            hass: Home Assistant instance
+        """
+        for column in self._COLUMNS:
+            setattr(self, column, array("d"))
+        self._dimensions = []
+        self._source_units = []
+        self._converters = []
+        self._listeners = []
+        self._sources = []
+        self._slots = {}
+        self._free_slots = []
+        hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed)
+        # A source holding its value keeps reporting the same state; each report
+        # closes an interval, so a held rate is integrated up to it and a total
+        # that stopped increasing derives a rate of 0
+        if EVENT_STATE_REPORTED is not None:
+            hass.bus.async_listen(
+                EVENT_STATE_REPORTED, self._async_state_changed,
+                event_filter=self._async_is_followed,
+            )
+
+    def _allocate(self, source, dimension, listener, values):
+        """
+        Allocate a slot following source.
+
+        Args:
+            source: Entity ID of the source sensor
+            dimension: Dimension of the source's unit
+            listener: Callback invoked after each update of the slot
+            values: Initial value of each column, in _COLUMNS order
+
+        Returns:
+            Slot number
+        """
+        columns = [getattr(self, column) for column in self._COLUMNS]
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            for column, value in zip(columns, values):
+                column[slot] = value
+            self._dimensions[slot] = dimension
+            self._source_units[slot] = None
+            self._converters[slot] = None
+            self._listeners[slot] = listener
+            self._sources[slot] = source
+        else:
+            slot = len(self._sources)
+            for column, value in zip(columns, values):
+                column.append(value)
+            self._dimensions.append(dimension)
+            self._source_units.append(None)
+            self._converters.append(None)
+            self._listeners.append(listener)
+            self._sources.append(source)
+        self._slots.setdefault(source, []).append(slot)
+        return slot
+
+    def remove(self, slot):
+        """Stop following the source of slot and free it for reuse."""
+        source = self._sources[slot]
+        slots = self._slots.get(source)
+        if slots is not None and slot in slots:
+            slots.remove(slot)
+            if not slots:
+                del self._slots[source]
+        self._listeners[slot] = None
+        self._converters[slot] = None
+        self._sources[slot] = None
+        self._free_slots.append(slot)
+
+    def _to_base(self, slot, state):
+        """
+        Parse a source state into the base unit of the slot's dimension.
+
+        The converter is looked up again only when the source's unit changes.
+
+        Returns:
+            The value in the base unit, or NaN if it is not numeric or convertible
+        """
+        value = _parse_number(state.state)
+        if value is None:
+            return _NAN
+        unit = state.attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+        if unit != self._source_units[slot] or self._converters[slot] is None:
+            self._source_units[slot] = unit
+            self._converters[slot] = self._compile_converter(slot, unit)
+        converter = self._converters[slot]
+        return _NAN if converter is None else converter(value)
+
+    def _compile_converter(self, slot, unit):
+        """Return the converter from unit to the base unit, or None if unsupported."""
+        dimension = self._dimensions[slot]
+        source_unit = _lookup_unit(unit, dimension) if unit else None
+        if source_unit is None:
+            _WARNINGS.warn(self._sources[slot], f"Cannot read unit as {dimension}", unit)
+            return None
+        return _get_converter(source_unit, _BASE_UNITS[dimension], exact=True)
+
+    @abstractmethod
+    def sample(self, slot, state):
+        """Update slot from a state of its source (None if the source was removed)."""
+
+    @callback
+    def _async_is_followed(self, event_data):
+        """Event filter passing only events of followed entities."""
+        return event_data["entity_id"] in self._slots
+
+    @callback
+    def _async_state_changed(self, event):
+        """Update every slot of the changed entity."""
+        data = event.data
+        slots = self._slots.get(data["entity_id"])
+        if slots is None:
+            return
+        new_state = data["new_state"]
+        for slot in slots:
+            self.sample(slot, new_state)
+            self._listeners[slot]()
+
+class IntegratorEngine(_SlotEngine):
+    """
+    Integrate rate sensors into totals from a single state change listener.
+
+    Each integral owns a slot: its total, last rate and last sample time are
+    kept in array('d') columns and its method in a bytearray. Rates and totals
+    are held in the base units of their dimensions (W and J, L/min and L), so
+    a sample costs one converter call whatever the source unit, and a source
+    changing units mid-stream is converted from the new unit on its next
+    sample.
+
+    Gaps are not integrated: an unavailable or non-numeric sample ends the
+    current segment and the next valid sample starts a new one. The left
+    method still holds the last rate up to the sample that ends the segment.
+    """
+
+    _COLUMNS = ("_totals", "_last_rates", "_last_times", "_time_scales")
+
+    def __init__(self, hass):
+        """Initialize the engine and start listening for state changes."""
+        self._methods = bytearray()
+        super().__init__(hass)
+
+    def add(self, source, total_dimension, method, listener):
+        """
+        Allocate a slot integrating source into a total.
+
+        Args:
+            source: Entity ID of the rate sensor
+            total_dimension: Dimension of the total (ENERGY or VOLUME)
+            method: 'trapezoidal', 'left' or 'right'
+            listener: Callback invoked after each update of the total
+
+        Returns:
+            Slot number, used to read and set the total
+        """
+        rate_dimension, time_scale = _RATE_DIMENSIONS[total_dimension]
+        slot = self._allocate(
+            source, rate_dimension, listener, (0.0, _NAN, 0.0, 1.0 / time_scale)
+        )
+        if slot == len(self._methods):
+            self._methods.append(_METHOD_CODES[method])
+        else:
+            self._methods[slot] = _METHOD_CODES[method]
+        return slot
+
+    def total(self, slot):
+        """Return the total of slot, in the base unit of its dimension."""
+        return self._totals[slot]
+
+    def set_total(self, slot, value):
+        """Set the total of slot, in the base unit of its dimension (e.g. when restored)."""
+        self._totals[slot] = value
+
+    def sample(self, slot, state):
+        """
+        Integrate a state of the source up to its timestamp.
+
+        Args:
+            slot: Slot of the integral
+            state: New State of the source entity, or None if it was removed
+        """
+        if state is not None:
+            rate = self._to_base(slot, state)
+            now = _sample_time(state).timestamp()
+        else:
+            rate = _NAN
+            now = self._last_times[slot]
+
+        last_rate = self._last_rates[slot]
+        method = self._methods[slot]
+        # NaN compares unequal to itself. Only the left method can integrate up
+        # to an invalid sample, as it holds the previous rate over the interval
+        if last_rate == last_rate and (rate == rate or method == _LEFT):
+            elapsed = now - self._last_times[slot]
+            if elapsed > 0:
+                if method == _TRAPEZOIDAL:
+                    area = (last_rate + rate) * 0.5 * elapsed
+                elif method == _LEFT:
+                    area = last_rate * elapsed
+                else:
+                    area = rate * elapsed
+                self._totals[slot] += area * self._time_scales[slot]
+        self._last_rates[slot] = rate
+        self._last_times[slot] = now
+
+class DerivativeEngine(_SlotEngine):
+    """
+    Derive rates from cumulative total sensors from a single state change listener.
+
+    Each derivative owns a slot holding the last total and sample time, the
+    smoothed rate, its time window and the rate's time scale, all in array('d')
+    columns. Totals and rates are held in base units (J and W, L and L/min).
+
+    Rates are smoothed with an exponential moving average whose time constant
+    is the time window, weighting each new rate by how long its interval was;
+    a window of 0 reports the rate of the last interval. A total that
+    decreases is taken as a meter reset and only re-baselines the derivative,
+    unless the source's state_class is 'total', whose totals may decrease.
+    """
+
+    _COLUMNS = ("_last_totals", "_last_times", "_rates", "_time_windows", "_time_scales")
+
+    def add(self, source, rate_dimension, time_window, listener):
+        """
+        Allocate a slot differentiating source into a rate.
+
+        Args:
+            source: Entity ID of the cumulative total sensor
+            rate_dimension: Dimension of the rate (POWER or FLOW)
+            time_window: Smoothing time constant in seconds, 0 for none
+            listener: Callback invoked after each update of the rate
+
+        Returns:
+            Slot number, used to read the rate
+        """
+        total_dimension = _TOTAL_DIMENSIONS[rate_dimension]
+        time_scale = _RATE_DIMENSIONS[total_dimension][1]
+        return self._allocate(
+            source, total_dimension, listener, (_NAN, 0.0, _NAN, time_window, time_scale)
+        )
+
+    def rate(self, slot):
+        """Return the rate of slot in the base unit of its dimension, or None if unknown."""
+        rate = self._rates[slot]
+        return None if rate != rate else rate
+
+    def sample(self, slot, state):
+        """
+        Differentiate a state of the source against the previous one.
+
+        Args:
+            slot: Slot of the derivative
+            state: New State of the source entity, or None if it was removed
+        """
+        total = _NAN if state is None else self._to_base(slot, state)
+        if total != total:
+            # Unknown until two valid samples span an interval again
+            self._last_totals[slot] = _NAN
+            self._rates[slot] = _NAN
+            return
+
+        now = _sample_time(state).timestamp()
+        last_total = self._last_totals[slot]
+        if last_total == last_total:
+            elapsed = now - self._last_times[slot]
+            if elapsed <= 0:
+                # Same timestamp: keep the earlier sample as the interval start
+                return
+            change = total - last_total
+            # Totals with the 'total' state class may decrease; others only on a reset
+            if change >= 0 or state.attributes.get(ATTR_STATE_CLASS) == SensorStateClass.TOTAL:
+                rate = change / elapsed * self._time_scales[slot]
+                last_rate = self._rates[slot]
+                window = self._time_windows[slot]
+                if window and last_rate == last_rate:
+                    rate = last_rate + (rate - last_rate) * -math.expm1(-elapsed / window)
+                self._rates[slot] = rate
+        self._last_totals[slot] = total
+        self._last_times[slot] = now
@@ -0,0 +1,563 @@
+"""
+Sensor platform for Unit Conversions.
+
+Provides converted mirror sensors: entities that follow another sensor and
+report its state converted to a different unit, without any template rendering.
+Integral sensors accumulate a power or flow sensor into an energy or volume total,
+and derivative sensors derive the power or flow of a cumulative meter.
+"""
+import time
+
+from homeassistant.components.sensor import (
+    ATTR_STATE_CLASS,
+    RestoreSensor,
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+from homeassistant.const import (
+    ATTR_DEVICE_CLASS,
+    ATTR_UNIT_OF_MEASUREMENT,
+    CONF_METHOD,
+    CONF_NAME,
+    CONF_SOURCE,
+    CONF_UNIQUE_ID,
+    CONF_UNIT_OF_MEASUREMENT,
+    EVENT_STATE_CHANGED,
+    STATE_UNAVAILABLE,
+)
+from homeassistant.core import callback, split_entity_id
+from homeassistant.helpers.event import async_call_later
+
+from . import (
+    _BASE_UNITS,
+    _DERIVED_ENTITIES,
+    _UNITS,
+    _WARNINGS,
+    ENERGY,
+    POWER,
+    _canonical_unit,
+    _get_converter,
+    _lookup_unit,
+    _parse_number,
+)
+from .const import (
+    CONF_ABSOLUTE_DEADBAND,
+    CONF_COALESCE_WINDOW,
+    CONF_DERIVATIVES,
+    CONF_INTEGRALS,
+    CONF_MIN_INTERVAL,
+    CONF_MIRROR_DEVICE_CLASSES,
+    CONF_MIRRORS,
+    CONF_RELATIVE_DEADBAND,
+    CONF_TIME_WINDOW,
+    DOMAIN,
+)
+from .rates import DerivativeEngine, IntegratorEngine
+
+ATTR_METHOD = "method"
+ATTR_SOURCE = "source"
+ATTR_TIME_WINDOW = "time_window"
+
+# Domain of the entities mirrored by device class
+SOURCE_DOMAIN = "sensor"
+
+WRITE_OPTION_KEYS = (CONF_ABSOLUTE_DEADBAND, CONF_RELATIVE_DEADBAND, CONF_MIN_INTERVAL)
+
+def _write_options(config):
+    """Pick the state write options set in a config dict."""
+    return {key: config[key] for key in WRITE_OPTION_KEYS if key in config}
+
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
+    """
+    Set up converted mirror, integral and derivative sensors.
+    
+    Both are configured under the unit_conversions key and discovered by the
+    component, so this platform is not set up from sensor configuration.
+    """
+    if discovery_info is None:
+        return
+
+    conf = hass.data[DOMAIN]
+    dispatcher = MirrorDispatcher(
+        hass,
+        async_add_entities,
+        conf[CONF_MIRROR_DEVICE_CLASSES],
+        _write_options(conf),
+        conf.get(CONF_COALESCE_WINDOW),
+    )
+    for mirror in conf[CONF_MIRRORS]:
+        dispatcher.add_mirror(
+            mirror[CONF_SOURCE],
+            mirror[CONF_UNIT_OF_MEASUREMENT],
+            mirror.get(CONF_NAME),
+            mirror.get(CONF_UNIQUE_ID),
+            _write_options(mirror),
+        )
+    for state in hass.states.async_all(SOURCE_DOMAIN):
+        dispatcher.discover(state)
+
+    # Everything known at startup is added in a single batch
+    dispatcher.async_flush_new_mirrors()
+
+    if conf[CONF_INTEGRALS]:
+        engine = IntegratorEngine(hass)
+        async_add_entities(
+            [
+                IntegralSensor(
+                    engine,
+                    integral[CONF_SOURCE],
+                    integral[CONF_UNIT_OF_MEASUREMENT],
+                    integral[CONF_METHOD],
+                    integral.get(CONF_NAME),
+                    integral.get(CONF_UNIQUE_ID),
+                )
+                for integral in conf[CONF_INTEGRALS]
+            ]
+        )
+
+    if conf[CONF_DERIVATIVES]:
+        engine = DerivativeEngine(hass)
+        async_add_entities(
+            [
+                DerivativeSensor(
+                    engine,
+                    derivative[CONF_SOURCE],
+                    derivative[CONF_UNIT_OF_MEASUREMENT],
+                    derivative[CONF_TIME_WINDOW],
+                    derivative.get(CONF_NAME),
+                    derivative.get(CONF_UNIQUE_ID),
+                )
+                for derivative in conf[CONF_DERIVATIVES]
+            ]
+        )
+
+class MirrorDispatcher:
+    """
+    Route state changes to converted mirrors through a single listener.
+    
+    Mirrors are indexed by source entity ID, so an event costs one dict lookup
+    whether or not it concerns a mirrored entity. Sensors with a configured
+    device class are mirrored as they appear; new mirrors are added to Home
+    Assistant in batches, once per event loop iteration.
+    
+    With a coalesce window, source updates are collected instead of dispatched
+    one by one. Only the latest state of each source is kept, and all of them
+    are converted and written together when the window closes.
+    """
+
+    def __init__(self, hass, async_add_entities, device_classes, write_options,
+                 coalesce_window=None):
+        """
+        Initialize the dispatcher and start listening for state changes.
+        
+        Args:
+            hass: Home Assistant instance
+            async_add_entities: Callback adding entities to the sensor platform
+            device_classes: Dict mapping a device class to the unit its sensors
+                            are mirrored in
+            write_options: Default deadband and interval options of all mirrors
+            coalesce_window: Seconds to collect source updates before dispatching
+                             them together (0 for one event loop iteration), or
+                             None to dispatch each update immediately
+        """
+        self._hass = hass
+        self._async_add_entities = async_add_entities
+        self._device_classes = device_classes
+        self._write_options = write_options
+        self._mirrors = {}
+        self._mirror_keys = set()
+        self._mirror_entity_ids = set()
+        self._new_mirrors = []
+        self._flush_scheduled = False
+        self._coalesce_window = coalesce_window
+        self._pending_states = {}
+        self._dispatch_scheduled = False
+        hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed)
+
+    def add_mirror(self, source, unit, name=None, unique_id=None, write_options=None):
+        """
+        Queue a mirror of source in unit, unless one already exists.
+        
+        Options in write_options override the dispatcher's defaults.
+        
+        Returns:
+            The new ConvertedMirrorSensor, or None if it is a duplicate
+        """
+        key = (source, _canonical_unit(unit))
+        if key in self._mirror_keys:
+            return None
+        self._mirror_keys.add(key)
+        mirror = ConvertedMirrorSensor(
+            self, source, unit, name, unique_id, {**self._write_options, **(write_options or {})}
+        )
+        self._new_mirrors.append(mirror)
+        return mirror
+
+    def discover(self, state):
+        """Queue a mirror for state's entity if its device class is mirrored."""
+        unit = self._device_classes.get(state.attributes.get(ATTR_DEVICE_CLASS))
+        if (
+            unit is not None
+            and state.domain == SOURCE_DOMAIN
+            and state.entity_id not in self._mirror_entity_ids
+        ):
+            self.add_mirror(state.entity_id, unit)
+
+    @callback
+    def async_flush_new_mirrors(self):
+        """Add all queued mirrors to Home Assistant in one batch."""
+        self._flush_scheduled = False
+        if self._new_mirrors:
+            new_mirrors, self._new_mirrors = self._new_mirrors, []
+            self._async_add_entities(new_mirrors)
+
+    @callback
+    def async_register(self, mirror):
+        """Start routing state changes of mirror's source to it."""
+        self._mirror_entity_ids.add(mirror.entity_id)
+        self._mirrors.setdefault(mirror.source, []).append(mirror)
+
+    @callback
+    def async_unregister(self, mirror):
+        """Stop routing state changes to mirror."""
+        self._mirror_entity_ids.discard(mirror.entity_id)
+        mirrors = self._mirrors.get(mirror.source)
+        if mirrors is not None and mirror in mirrors:
+            mirrors.remove(mirror)
+            if not mirrors:
+                del self._mirrors[mirror.source]
+
+    @callback
+    def _async_state_changed(self, event):
+        """Dispatch a state change to the mirrors of its entity."""
+        data = event.data
+        entity_id = data["entity_id"]
+        mirrors = self._mirrors.get(entity_id)
+        if mirrors is not None:
+            if self._coalesce_window is None:
+                for mirror in mirrors:
+                    mirror.async_source_changed(data["new_state"])
+                return
+            self._pending_states[entity_id] = data["new_state"]
+            if not self._dispatch_scheduled:
+                self._dispatch_scheduled = True
+                if self._coalesce_window:
+                    self._hass.loop.call_later(
+                        self._coalesce_window, self._async_dispatch_pending
+                    )
+                else:
+                    self._hass.loop.call_soon(self._async_dispatch_pending)
+        elif self._device_classes and data["old_state"] is None and data["new_state"] is not None:
+            # A new entity appeared; mirror it if its device class is configured
+            self.discover(data["new_state"])
+            if self._new_mirrors and not self._flush_scheduled:
+                self._flush_scheduled = True
+                self._hass.loop.call_soon(self.async_flush_new_mirrors)
+
+    @callback
+    def _async_dispatch_pending(self):
+        """Convert and write the source updates collected in the coalesce window."""
+        self._dispatch_scheduled = False
+        pending, self._pending_states = self._pending_states, {}
+        for entity_id, new_state in pending.items():
+            for mirror in self._mirrors.get(entity_id, ()):
+                mirror.async_source_changed(new_state)
+
+class ConvertedMirrorSensor(SensorEntity):
+    """
+    Sensor reporting another entity's state converted to a different unit.
+    
+    The converter is looked up once per source unit, so each source update
+    costs a float parse and a single multiply(-add). Converted values that fall
+    within the deadbands of the last written state are not written, and writes
+    are spaced at least min_interval seconds apart; the latest value is written
+    once the interval has passed.
+    """
+
+    _attr_should_poll = False
+
+    def __init__(self, dispatcher, source, unit, name=None, unique_id=None, write_options=None):
+        """
+        Initialize the mirror.
+        
+        Args:
+            dispatcher: MirrorDispatcher delivering the source's state changes
+            source: Entity ID of the sensor to mirror
+            unit: Unit to report the converted state in (any supported spelling)
+            name: Optional name, defaults to the source object ID plus the unit
+            unique_id: Optional unique ID, defaults to one derived from source and unit
+            write_options: Optional dict with absolute_deadband (in the target unit),
+                           relative_deadband (fraction of the last value) and
+                           min_interval (seconds between writes)
+        """
+        self._dispatcher = dispatcher
+        self._source = source
+        self._target = _canonical_unit(unit)
+        definition = _UNITS[self._target]
+        self._dimension = definition.dimension
+        self._source_unit = None
+        self._converter = None
+
+        write_options = write_options or {}
+        self._absolute_deadband = write_options.get(CONF_ABSOLUTE_DEADBAND, 0.0)
+        self._relative_deadband = write_options.get(CONF_RELATIVE_DEADBAND, 0.0)
+        self._min_interval = write_options.get(CONF_MIN_INTERVAL, 0.0)
+        self._latest_available = True
+        self._latest_value = None
+        self._written_at = 0.0
+        self._unsub_delayed_write = None
+
+        self._attr_name = name or f"{split_entity_id(source)[1]} {definition.symbol}"
+        self._attr_unique_id = unique_id or f"{DOMAIN}_{source}_{self._target.lower()}"
+        self._attr_native_unit_of_measurement = definition.symbol
+        self._attr_extra_state_attributes = {ATTR_SOURCE: source}
+
+    @property
+    def source(self):
+        """Entity ID of the mirrored sensor."""
+        return self._source
+
+    async def async_added_to_hass(self):
+        """Follow the source entity once added."""
+        _DERIVED_ENTITIES.add(self.entity_id)
+        self._dispatcher.async_register(self)
+        self.update_from_source(self.hass.states.get(self._source))
+        self._attr_available = self._latest_available
+        self._attr_native_value = self._latest_value
+        self._written_at = time.monotonic()
+
+    async def async_will_remove_from_hass(self):
+        """Stop following the source entity."""
+        _DERIVED_ENTITIES.discard(self.entity_id)
+        self._dispatcher.async_unregister(self)
+        if self._unsub_delayed_write is not None:
+            self._unsub_delayed_write()
+            self._unsub_delayed_write = None
+
+    @callback
+    def async_source_changed(self, new_state):
+        """Convert a new state of the source entity and write it if significant."""
+        self.update_from_source(new_state)
+        self._async_write_if_significant()
+
+    @callback
+    def _async_write_if_significant(self, *_):
+        """Write the latest converted value unless it is suppressed."""
+        available = self._latest_available
+        value = self._latest_value
+        if available == self._attr_available:
+            if not self._is_significant(value):
+                return
+            if self._min_interval:
+                wait = self._written_at + self._min_interval - time.monotonic()
+                if wait > 0:
+                    if self._unsub_delayed_write is None:
+                        self._unsub_delayed_write = async_call_later(
+                            self.hass, wait, self._async_delayed_write
+                        )
+                    return
+
+        self._attr_available = available
+        self._attr_native_value = value
+        self._written_at = time.monotonic()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_delayed_write(self, *_):
+        """Write the value held back by min_interval."""
+        self._unsub_delayed_write = None
+        self._async_write_if_significant()
+
+    def _is_significant(self, value):
+        """Return True if value differs enough from the last written value."""
+        last = self._attr_native_value
+        if value is None or last is None:
+            return value is not last
+        change = abs(value - last)
+        if change == 0.0 or change <= self._absolute_deadband:
+            return False
+        return change > self._relative_deadband * abs(last)
+
+    def update_from_source(self, state):
+        """
+        Convert a state of the source entity into the latest value to write.
+        
+        Args:
+            state: New State of the source entity, or None if it was removed
+        """
+        if state is None or state.state == STATE_UNAVAILABLE:
+            self._latest_available = False
+            self._latest_value = None
+            return
+        self._latest_available = True
+
+        attributes = state.attributes
+        unit = attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+        if self._converter is None or unit != self._source_unit:
+            self._source_unit = unit
+            self._converter = self._compile_converter(unit)
+            self._attr_device_class = attributes.get(ATTR_DEVICE_CLASS)
+            self._attr_state_class = attributes.get(ATTR_STATE_CLASS)
+
+        value = _parse_number(state.state)
+        if value is None or self._converter is None:
+            self._latest_value = None
+        else:
+            self._latest_value = self._converter(value)
+
+    def _compile_converter(self, unit):
+        """Return the converter from the source unit, or None if it is not convertible."""
+        source_unit = _lookup_unit(unit, self._dimension) if unit else None
+        if source_unit is None:
+            _WARNINGS.warn(
+                self.entity_id or self._source,
+                f"Cannot convert unit to {_UNITS[self._target].name}",
+                unit,
+            )
+            return None
+        return _get_converter(source_unit, self._target)
+
+class IntegralSensor(RestoreSensor):
+    """
+    Sensor accumulating a power or flow sensor into an energy or volume total.
+    
+    The running total is kept by a shared IntegratorEngine in the base unit of
+    its dimension and converted to the sensor's unit when the state is written.
+    The total is restored across restarts.
+    """
+
+    _attr_should_poll = False
+    _attr_state_class = SensorStateClass.TOTAL
+
+    def __init__(self, engine, source, unit, method, name=None, unique_id=None):
+        """
+        Initialize the integral.
+        
+        Args:
+            engine: IntegratorEngine keeping the running total
+            source: Entity ID of the power or flow sensor to integrate
+            unit: Energy or volume unit to report the total in
+            method: Riemann sum method, 'trapezoidal', 'left' or 'right'
+            name: Optional name, defaults to the source object ID plus the unit
+            unique_id: Optional unique ID, defaults to one derived from source and unit
+        """
+        self._engine = engine
+        self._source = source
+        self._method = method
+        self._target = _canonical_unit(unit)
+        definition = _UNITS[self._target]
+        self._dimension = definition.dimension
+        self._base_unit = _BASE_UNITS[self._dimension]
+        # Unrounded: the reported total is what a restart restores from
+        self._from_base = _get_converter(self._base_unit, self._target, exact=True)
+        self._slot = None
+
+        self._attr_name = name or f"{split_entity_id(source)[1]} {definition.symbol}"
+        self._attr_unique_id = unique_id or f"{DOMAIN}_{source}_{self._target.lower()}_integral"
+        self._attr_native_unit_of_measurement = definition.symbol
+        self._attr_device_class = (
+            SensorDeviceClass.ENERGY if self._dimension == ENERGY else SensorDeviceClass.VOLUME
+        )
+        self._attr_extra_state_attributes = {ATTR_SOURCE: source, ATTR_METHOD: method}
+
+    @property
+    def native_value(self):
+        """Running total in the sensor's unit."""
+        if self._slot is None:
+            return None
+        return self._from_base(self._engine.total(self._slot))
+
+    async def async_added_to_hass(self):
+        """Restore the last total and start integrating the source."""
+        _DERIVED_ENTITIES.add(self.entity_id)
+        self._slot = self._engine.add(
+            self._source, self._dimension, self._method, self.async_write_ha_state
+        )
+        last = await self.async_get_last_sensor_data()
+        if last is not None:
+            self._restore_total(last.native_value, last.native_unit_of_measurement)
+        # The current source state opens the first interval
+        self._engine.sample(self._slot, self.hass.states.get(self._source))
+
+    async def async_will_remove_from_hass(self):
+        """Stop integrating the source."""
+        _DERIVED_ENTITIES.discard(self.entity_id)
+        if self._slot is not None:
+            self._engine.remove(self._slot)
+            self._slot = None
+
+    def _restore_total(self, value, unit):
+        """Set the running total from a restored value and unit."""
+        value = _parse_number(value)
+        unit = _lookup_unit(unit, self._dimension) if unit else None
+        if value is not None and unit is not None:
+            to_base = _get_converter(unit, self._base_unit, exact=True)
+            self._engine.set_total(self._slot, to_base(value))
+
+class DerivativeSensor(SensorEntity):
+    """
+    Sensor reporting the power or flow of a cumulative energy or volume meter.
+    
+    The rate is derived by a shared DerivativeEngine in the base unit of its
+    dimension and converted to the sensor's unit when the state is written.
+    """
+
+    _attr_should_poll = False
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, engine, source, unit, time_window=0.0, name=None, unique_id=None):
+        """
+        Initialize the derivative.
+        
+        Args:
+            engine: DerivativeEngine deriving the rate
+            source: Entity ID of the cumulative meter
+            unit: Power or flow unit to report the rate in
+            time_window: Smoothing time constant in seconds, 0 for none
+            name: Optional name, defaults to the source object ID plus the unit
+            unique_id: Optional unique ID, defaults to one derived from source and unit
+        """
+        self._engine = engine
+        self._source = source
+        self._time_window = time_window
+        self._target = _canonical_unit(unit)
+        definition = _UNITS[self._target]
+        self._dimension = definition.dimension
+        self._from_base = _get_converter(_BASE_UNITS[self._dimension], self._target)
+        self._slot = None
+
+        self._attr_name = name or f"{split_entity_id(source)[1]} {definition.symbol}"
+        self._attr_unique_id = unique_id or f"{DOMAIN}_{source}_{self._target.lower()}_derivative"
+        self._attr_native_unit_of_measurement = definition.symbol
+        self._attr_device_class = (
+            SensorDeviceClass.POWER
+            if self._dimension == POWER
+            else SensorDeviceClass.VOLUME_FLOW_RATE
+        )
+        self._attr_extra_state_attributes = {
+            ATTR_SOURCE: source,
+            ATTR_TIME_WINDOW: time_window,
+        }
+
+    @property
+    def native_value(self):
+        """Latest rate in the sensor's unit, or None until two samples are known."""
+        rate = None if self._slot is None else self._engine.rate(self._slot)
+        return None if rate is None else self._from_base(rate)
+
+    async def async_added_to_hass(self):
+        """Start differentiating the source."""
+        _DERIVED_ENTITIES.add(self.entity_id)
+        self._slot = self._engine.add(
+            self._source, self._dimension, self._time_window, self.async_write_ha_state
+        )
+        # The current source state is the first sample
+        self._engine.sample(self._slot, self.hass.states.get(self._source))
+
+    async def async_will_remove_from_hass(self):
+        """Stop differentiating the source."""
+        _DERIVED_ENTITIES.discard(self.entity_id)
+        if self._slot is not None:
+            self._engine.remove(self._slot)
+            self._slot = None
@@ -0,0 +1,44 @@
+"""
+Tests for same-unit conversions of offset units.
+
+Converting Kelvin to Kelvin or Fahrenheit to Fahrenheit must hand back the
+input unchanged on the list and array paths, not the input shifted to the
+zero point and back.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import os
+import sys
+from array import array
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "custom_components"))
+
+import unit_conversions  # noqa: E402
+
+VALUES = [0.1, 1.1, 98.6, 300.1, 451.3, -40.0]
+
+
+@pytest.mark.parametrize("unit", ["K", "F"])
+def test_same_unit_list_is_identity(unit):
+    assert unit_conversions._convert_many("test", VALUES, unit, unit, unit, None) == VALUES
+
+
+@pytest.mark.parametrize("unit", ["K", "F"])
+def test_same_unit_array_is_identity(unit):
+    values = array("d", VALUES)
+    result = unit_conversions._convert_array("test", values, unit, unit, unit, None)
+    assert result.tolist() == VALUES
+
+
+@pytest.mark.parametrize("unit", ["K", "F"])
+def test_same_unit_ndarray_is_identity(unit):
+    np = pytest.importorskip("numpy")
+    values = np.array(VALUES)
+    result = unit_conversions._convert_array("test", values, unit, unit, unit, None)
+    assert result.tolist() == VALUES
+    assert result is not values